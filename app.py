@@ -0,0 +1,446 @@
+from flask import Flask, render_template, request, send_from_directory, jsonify, Response, stream_with_context, abort, url_for
+from werkzeug.utils import secure_filename
+import json
+import os
+from datetime import datetime
+import cv2
+import pytesseract
+from gtts import gTTS
+import threading
+import time
+
+from text_models import text_recognition_upload
+from text_models import text_recognition_capture
+from text_models import text_recognition_live
+
+from object_models import object_detection_upload
+from object_models import object_detection_capture
+from object_models import object_detection_live
+
+from services.camera import camera_service
+from services.caption_batcher import caption_batcher
+from services.caption_cache import caption_cache
+from services.frame_change import ChangeDetector
+from services.frame_quality import text_quality_gate, object_quality_gate
+from services.frame_ingest import frame_ingest
+from services.layout import layout_store
+from services.text_tracker import TextRegionTracker
+from services.model_registry import registry
+from services.ocr_batcher import ocr_batcher
+from services.ocr_jobs import ocr_jobs
+from services.ocr_engine import ocr_engine
+from services.ocr_preprocess import preprocess_planner
+from services.ocr_tiling import tiled_ocr
+from services.tts_cache import tts_cache
+from services.speech_stream import speech_streamer
+from services.tts import synthesize_speech
+from text_models import text_correction
+
+app = Flask(__name__, static_folder='static')
+
+
+app.config['UPLOAD_FOLDER'] = 'static/captured'
+app.config['AUDIO_FOLDER'] = 'static/audio'
+# Request bodies above this size (PDFs and zip archives for /api/jobs included) get a 413
+app.config['MAX_CONTENT_LENGTH'] = int(float(os.environ.get('CLEARIFY_MAX_UPLOAD_MB', 100)) * 1024 * 1024)
+
+# Models are loaded lazily on first use. List models here (comma separated,
+# or "all") to load and warm them up on a background thread at startup instead.
+app.config['PRELOAD_MODELS'] = os.environ.get('CLEARIFY_PRELOAD_MODELS', '')
+
+
+def _parse_model_names(value):
+    if value.strip() == 'all':
+        return registry.names()
+    return [name.strip() for name in value.split(',') if name.strip() in registry.names()]
+
+
+if app.config['PRELOAD_MODELS']:
+    registry.preload(_parse_model_names(app.config['PRELOAD_MODELS']), background=True)
+
+
+# Per-frame handlers for frames captured in the browser (see /api/frames)
+def _text_capture_frame(frame, context):
+    accepted, reason, _ = text_quality_gate.check(frame)
+    if not accepted:
+        # Blurry, badly exposed or glaring frame: the client retries with a new one
+        return {'text': None, 'skipped': reason, 'audio_file': None}
+    text_output, audio_path = text_recognition_capture.recognize_frame(frame)
+    return {'text': text_output, 'audio_file': os.path.basename(audio_path) if audio_path else None}
+
+
+def _text_live_frame(frame, context):
+    change_detector = context.setdefault('change_detector', ChangeDetector())
+    tracker = context.setdefault('tracker', TextRegionTracker())
+    accepted, reason, _ = text_quality_gate.check(text_recognition_live.crop_roi(frame))
+    if not accepted:
+        return {'text': None, 'skipped': reason, 'audio_file': None}
+    recognized = text_recognition_live.recognize_live_frame(frame, change_detector, tracker)
+    if recognized is None:
+        # Scene unchanged: OCR skipped, the client keeps its previous text
+        return {'text': None, 'skipped': change_detector.last_reason, 'audio_file': None}
+    text, new_text = recognized
+    # Only lines that were not read before are spoken
+    return {'text': text, 'audio_file': os.path.basename(synthesize_speech(new_text)) if new_text else None}
+
+
+def _object_capture_frame(frame, context):
+    accepted, reason, _ = object_quality_gate.check(frame)
+    if not accepted:
+        return {'text': None, 'skipped': reason, 'audio_file': None}
+    timings = {}
+    description_text, _, audio_filename = object_detection_capture.describe_frame(frame, timings)
+    return {'text': description_text, 'audio_file': audio_filename,
+            'timings_ms': {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}}
+
+
+# A live session hears the same objects again at most this often (seconds)
+OBJECT_SPEECH_INTERVAL = 5.0
+
+
+def _object_live_frame(frame, context):
+    accepted, reason, _ = object_quality_gate.check(frame)
+    if not accepted:
+        return {'objects': None, 'skipped': reason, 'audio_file': None}
+    detections = object_detection_live.detect_frame(frame)
+    labels = sorted({class_name for class_name, _, _ in detections})
+    changed = labels != context.get('labels')
+    context['labels'] = labels
+    audio_file = None
+    # Speak when the set of objects changes, otherwise repeat it every few seconds
+    now = time.monotonic()
+    if labels and (changed or now - context.get('spoken_at', 0.0) >= OBJECT_SPEECH_INTERVAL):
+        audio_file = os.path.basename(synthesize_speech(f"I see {', '.join(labels)}"))
+        context['spoken_at'] = now
+    return {
+        'objects': [{'name': class_name, 'confidence': round(confidence, 3), 'box': box}
+                    for class_name, confidence, box in detections],
+        'audio_file': audio_file,
+    }
+
+
+frame_ingest.register('text-capture', _text_capture_frame)
+frame_ingest.register('text-live', _text_live_frame)
+frame_ingest.register('object-capture', _object_capture_frame)
+frame_ingest.register('object-live', _object_live_frame)
+
+
+@app.route('/')
+def home():
+    return render_template('home-page.html')
+
+
+@app.route('/about')
+def about():
+    return render_template('about.html')
+
+@app.route('/contact')
+def contact():
+    return render_template('contact.html')
+
+@app.route('/text')
+def text():
+    return render_template('text-recognition.html')
+
+
+@app.route('/text1')
+def text1():
+    return render_template('text-recognition-upload.html')
+
+
+@app.route('/text-recognition', methods=['POST'])
+def text_recognition():
+    # Retrieve image data from the request (replace with actual logic)
+    image_file = request.files.get('image')
+
+    if image_file:
+        # Save the image to a temporary location or use in-memory processing
+        image_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(image_file.filename))
+        image_file.save(image_path)
+
+        # Call the model1 function to perform text recognition
+        result, adjusted_image_path, timestamp = text_recognition_upload.perform_ocr_layout(image_path)
+        text = text_recognition_upload.result_text(result)
+        # Per-word confidences, so doubtful words can be highlighted
+        words = result.filtered().to_dict()['words']
+
+        # Audio is synthesized sentence by sentence while the browser is already playing it
+        stream_url = url_for('speech_stream', token=speech_streamer.register(text, lang='en'))
+
+        # Process the results (e.g., display text, play audio)
+        return render_template('text-recognition-upload.html', text=text, words=words, stream_url=stream_url, adjusted_image_path=adjusted_image_path, timestamp=timestamp)
+
+    else:
+        return render_template('text-recognition-upload.html', error="Please upload an image.")
+
+
+@app.route('/api/ocr', methods=['POST'])
+def api_ocr():
+    image_file = request.files.get('image')
+    if not image_file:
+        return jsonify(error="Please upload an image."), 400
+    image_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(image_file.filename))
+    image_file.save(image_path)
+
+    # Blocks -> lines -> words with boxes and confidences, in reading order.
+    # `text` leaves out low-confidence words; `words` flags doubtful ones for highlighting.
+    result, _, _ = text_recognition_upload.perform_ocr_layout(image_path)
+    payload = result.to_dict()
+    payload['text'] = result.filtered().text
+    return jsonify(layout_id=layout_store.put(result), **payload)
+
+
+@app.route('/api/ocr/<layout_id>/speak', methods=['POST'])
+def api_ocr_speak(layout_id):
+    result = layout_store.get(layout_id)
+    if result is None:
+        abort(404)
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify(error="Expected a JSON object."), 400
+    blocks = payload.get('blocks')
+    if blocks is not None and not (isinstance(blocks, list) and
+                                   all(isinstance(block, int) and not isinstance(block, bool) for block in blocks)):
+        return jsonify(error="`blocks` must be a list of block ids."), 400
+    # Only the requested blocks are spoken (all of them when `blocks` is missing), without noise
+    text = result.select(blocks).filtered().text
+    if not text.strip():
+        return jsonify(error="The selected blocks contain no text."), 400
+    stream_url = url_for('speech_stream', token=speech_streamer.register(text, lang=payload.get('lang', 'en')))
+    return jsonify(text=text, stream_url=stream_url)
+
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    if request.path.startswith('/api/'):
+        limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+        return jsonify(error=f"Uploads are limited to {limit_mb} MB."), 413
+    return error
+
+
+@app.route('/api/jobs', methods=['POST'])
+def create_ocr_job():
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify(error="Please upload a PDF or a zip archive of images."), 400
+    try:
+        job = ocr_jobs.submit(upload.filename or '', upload.read())
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(job_id=job.id,
+                   status_url=url_for('ocr_job_status', job_id=job.id),
+                   events_url=url_for('ocr_job_events', job_id=job.id)), 202
+
+
+@app.route('/api/jobs/<job_id>')
+def ocr_job_status(job_id):
+    job = ocr_jobs.get(job_id)
+    if job is None:
+        abort(404)
+    # Pages finished so far, in page order; the transcript is complete once status is "done"
+    return jsonify(**job.progress(), pages=job.ordered_pages(), transcript=job.transcript())
+
+
+@app.route('/api/jobs/<job_id>/events')
+def ocr_job_events(job_id):
+    job = ocr_jobs.get(job_id)
+    if job is None:
+        abort(404)
+
+    # Server-sent events: one "page" event per finished page, "progress" after every change
+    def events():
+        for name, data in ocr_jobs.watch(job):
+            yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-store'})
+
+
+@app.route('/api/frames/<mode>', methods=['POST'])
+def ingest_frame(mode):
+    if mode not in frame_ingest.modes():
+        abort(404)
+    session_id = request.args.get('session') or request.form.get('session')
+    upload = request.files.get('frame')
+    data = upload.read() if upload else request.get_data()
+    if not session_id or not data:
+        return jsonify(error="A session id and a JPEG/WebP frame are required."), 400
+    # Returns immediately; the frame is processed in the background
+    return jsonify(frame_ingest.submit(mode, session_id, data)), 202
+
+
+@app.route('/api/frames/<mode>/result')
+def frame_result(mode):
+    if mode not in frame_ingest.modes():
+        abort(404)
+    payload = frame_ingest.result(mode, request.args.get('session', ''), request.args.get('after', 0, type=int))
+    if payload is None:
+        return '', 204
+    return jsonify(payload)
+
+
+@app.route('/speech/<token>')
+def speech_stream(token):
+    pending = speech_streamer.get(token)
+    if pending is None:
+        abort(404)
+    text, lang = pending
+    chunks, mimetype = speech_streamer.stream(text, lang)
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={'Cache-Control': 'no-store'})
+
+
+@app.route('/models')
+def models():
+    # Load time and approximate resident size of every shared model
+    return jsonify(registry.stats())
+
+
+@app.route('/metrics')
+def metrics():
+    return jsonify(
+        models=registry.stats(),
+        ocr_batcher=ocr_batcher.metrics(),
+        ocr_engine=ocr_engine.metrics(),
+        ocr_preprocess=preprocess_planner.metrics(),
+        ocr_tiling=tiled_ocr.metrics(),
+        ocr_jobs=ocr_jobs.metrics(),
+        caption_batcher=caption_batcher.metrics(),
+        caption_cache=caption_cache.metrics(),
+        object_capture=object_detection_capture.pipeline_metrics(),
+        tts_cache=tts_cache.metrics(),
+        speech_stream=speech_streamer.metrics(),
+        spell_cache=text_correction.cache_metrics(),
+        camera=camera_service.status(),
+        frame_ingest=frame_ingest.metrics(),
+        live_ocr=text_recognition_live.ocr_processor.metrics(),
+        text_quality=text_quality_gate.metrics(),
+        object_quality=object_quality_gate.metrics(),
+    )
+
+
+@app.route('/healthz')
+def healthz():
+    return jsonify(status='ok')
+
+
+@app.route('/readyz')
+def readyz():
+    readiness = registry.readiness()
+    return jsonify(readiness), (200 if readiness['ready'] else 503)
+
+
+@app.route('/warmup', methods=['POST'])
+def warmup():
+    # One dummy inference per model; ?models=ocr,caption limits the set
+    names = _parse_model_names(request.args.get('models', 'all'))
+    timings = {}
+    for name in names:
+        try:
+            timings[name] = {'warmup_seconds': round(registry.warmup(name), 3)}
+        except Exception as e:
+            timings[name] = {'error': str(e)}
+    return jsonify(models=timings, stats=registry.stats())
+
+
+@app.route('/audio/<path:filename>')
+def serve_audio(filename):
+    return send_from_directory(app.config['AUDIO_FOLDER'], filename)
+
+
+
+
+@app.route('/text2')
+def text2():
+      return render_template('text-recognition-capture.html')
+
+
+@app.route('/text-capture', methods=['POST'])
+def text_capture():
+    text_output, img_path, audio_path = text_recognition_capture.perform_text_capture()
+    return render_template('text-recognition-capture.html', text_output=text_output, img_path=img_path, audio_path=audio_path)
+
+    
+
+@app.route('/text3')
+def text3():
+    return render_template('text-recognition-live.html')
+
+
+@app.route('/text-live', methods=['POST'])
+def text_live():
+    
+    text = text_recognition_live.perform_live_text()
+
+    return render_template('text-recognition-live.html', text=text )
+
+
+
+@app.route('/object')
+def object():
+    return render_template('object-detection.html')
+
+
+@app.route('/object1')
+def object1():
+    return render_template('object-detection-upload.html')
+
+
+@app.route('/object-upload', methods=['POST'])
+def object_upload():
+    if 'file' not in request.files:
+        return 'No file part'
+    file = request.files['file']
+    if file.filename == '':
+        return 'No selected file'
+    if file:
+        filename = secure_filename(file.filename)
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        file.save(file_path)
+        
+        # Call the object detection and generate audio description
+        detection_result, audio_path, timestap = object_detection_upload.detect_objects(file_path)
+        
+        # Get paths for displaying results
+        audio_file = os.path.basename(audio_path)
+        
+        return render_template('object-detection-upload.html', detection_result=detection_result, audio_file=audio_file, timestap=timestap)
+
+@app.route('/uploads/<filename>')
+def uploaded_file(filename):
+    return send_from_directory(app.config['AUDIO_FOLDER'], filename)
+
+
+@app.route('/object2')
+def object2():
+    return render_template('object-detection-capture.html')
+
+
+@app.route('/object-capture')
+def object_capture():
+
+    description_text, img_filename, audio_filename = object_detection_capture.perform_object_detection()
+
+    # Render a template with the detection results and paths to the image and audio file
+    return render_template('object-detection-capture.html', description_text=description_text, img_filename=img_filename, audio_filename=audio_filename)
+
+
+@app.route('/give_image/<filename>')
+def give_image(filename):
+    return send_from_directory('static/captured', filename)
+
+@app.route('/give_audio/<filename>')
+def give_audio(filename):
+    return send_from_directory(app.config['AUDIO_FOLDER'], filename)
+
+
+@app.route('/object3')
+def object3():
+    return render_template('object-detection-live.html')
+
+
+@app.route('/object-live', methods=['POST'])
+def object_live():
+    
+    detected_objects = object_detection_live.object_detection() or []
+
+    return render_template('object-detection-live.html',  detected_objects=detected_objects )
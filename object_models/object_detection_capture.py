@@ -1,19 +1,21 @@
 from flask import Flask
 import cv2
-import torch
-from gtts import gTTS
 import os
-from datetime import datetime
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-import numpy as np
-from transformers import BlipProcessor, BlipForConditionalGeneration
+from services.camera import camera_service
+from services.frame_quality import object_quality_gate
+from services.caption_batcher import caption_batcher
+from services.caption_cache import caption_cache
+from services.model_registry import get_yolov5
+from services.tts import synthesize_speech
 
 app = Flask(__name__, static_folder='static')
 app.config['AUDIO_FOLDER'] = 'static/audio'
 
-processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-caption_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-
 def adjust_brightness_contrast(img, alpha=1.0, beta=0):
 
     # Apply brightness and contrast adjustment
@@ -22,58 +24,128 @@ def adjust_brightness_contrast(img, alpha=1.0, beta=0):
     return adjusted_img
 
   
-def perform_object_detection():
-    cap = cv2.VideoCapture(0)
-    # Load YOLOv5 model
-    model = torch.hub.load('ultralytics/yolov5', 'yolov5l', pretrained=True)
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        cv2.imshow('Press "c" to Capture or "Esc" to Exit', frame)
-
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord('c'):
-            # Save original
-            original_img_path = 'static/captured/captured_image.jpg'
-            cv2.imwrite(original_img_path, frame)
-            # Adjust
-            adjusted = adjust_brightness_contrast(frame, alpha=1.5, beta=20)
-            adjusted_img_path = 'static/captured/adjusted_captured_image.jpg'
-            cv2.imwrite(adjusted_img_path, adjusted)
-
-            # Optional YOLO detection
-            results = model(adjusted)
-
-            # Caption with BLIP
-            rgb = cv2.cvtColor(adjusted, cv2.COLOR_BGR2RGB)
-            pil_img = Image.fromarray(rgb)
-            inputs = processor(pil_img, return_tensors="pt")
-            out = caption_model.generate(**inputs)
-            description_text = processor.decode(out[0], skip_special_tokens=True).capitalize()
-
-            # Append YOLO labels
-            labels = results.pandas().xyxy[0]['name'].unique()
-            obj_list = ", ".join(labels) if labels.size > 0 else "no objects"
-            description_text += f" (Objects detected: {obj_list}.)"
-
-            # Generate and save audio
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-            audio_filename = f'description_{timestamp}.mp3'
-            audio_path = os.path.join('static/audio', audio_filename)
-            tts = gTTS(description_text, lang='en')
-            tts.save(audio_path)
-
-            cap.release()
-            cv2.destroyAllWindows()
-            return description_text, adjusted_img_path, audio_filename
-
-        elif key == 27:
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
-    return "", "", ""
+# Detection and captioning are independent, so they run side by side on
+# their own executors; TTS starts as soon as both are merged. End-to-end
+# latency is then close to the slower of the two instead of their sum.
+_detect_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='yolo')
+_caption_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='caption')
+
+_stats_lock = threading.Lock()
+_stage_seconds = Counter()
+_runs = 0
+
+
+def _timed(stage, timings, func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+def _detect_labels(adjusted):
+    results = get_yolov5()(adjusted)
+    return list(results.pandas().xyxy[0]['name'].unique())
+
+
+def _caption(adjusted):
+    rgb = cv2.cvtColor(adjusted, cv2.COLOR_BGR2RGB)
+    pil_img = Image.fromarray(rgb)
+    return caption_cache.get_or_create(pil_img, caption_batcher.caption).capitalize()
+
+
+def describe_frame(frame, timings=None):
+    """Captions a BGR frame and lists YOLO detections.
 
+    Returns (description_text, adjusted_frame, audio_filename). If `timings` is a
+    dict it receives the seconds spent per stage.
+    """
+    global _runs
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
 
+    # Adjust
+    adjusted = _timed('adjust', timings, adjust_brightness_contrast, frame, 1.5, 20)
+
+    # YOLO detection and BLIP captioning run concurrently
+    detection = _detect_executor.submit(_timed, 'detect', timings, _detect_labels, adjusted)
+    caption = _caption_executor.submit(_timed, 'caption', timings, _caption, adjusted)
+    description_text = caption.result()
+    labels = detection.result()
+    timings['parallel'] = time.perf_counter() - start - timings['adjust']
+
+    # Append YOLO labels
+    obj_list = ", ".join(labels) if labels else "no objects"
+    description_text += f" (Objects detected: {obj_list}.)"
+
+    # Generate audio (cached by text) as soon as the description is ready
+    audio_path = _timed('tts', timings, synthesize_speech, description_text, 'en')
+    timings['total'] = time.perf_counter() - start
+
+    with _stats_lock:
+        _runs += 1
+        _stage_seconds.update(timings)
+    print("Object capture timings: " + ", ".join(f"{stage} {seconds * 1000:.0f} ms"
+                                                  for stage, seconds in timings.items()))
+
+    return description_text, adjusted, os.path.basename(audio_path)
+
+
+def pipeline_metrics():
+    """Mean milliseconds per stage of describe_frame."""
+    with _stats_lock:
+        return {
+            'runs': _runs,
+            'mean_ms': {stage: round(seconds / _runs * 1000, 1) for stage, seconds in _stage_seconds.items()}
+            if _runs else {},
+        }
+
+
+def perform_object_detection():
+    try:
+        camera_service.acquire()
+    except RuntimeError:
+        return "", "", ""
+
+    frame_id = 0
+    status = ''
+    try:
+        while True:
+            try:
+                frame_id, frame = camera_service.read(frame_id)
+            except RuntimeError:
+                break
+            if status:
+                frame = frame.copy()
+                cv2.putText(frame, status, (20, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            cv2.imshow('Press "c" to Capture or "Esc" to Exit', frame)
+
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('c'):
+                # Take a short burst and keep the sharpest acceptable frame. The keyed
+                # frame is copied first: the burst reuses the camera's frame buffer
+                keyed = frame.copy()
+                try:
+                    frame_id, burst = camera_service.burst(4, frame_id)
+                except RuntimeError:
+                    break
+                frame, reason, scores = object_quality_gate.best_of([keyed] + burst)
+                if reason:
+                    status = f"Skipped ({reason}), press 'c' again"
+                    print(f"Frame skipped: {reason} {scores}")
+                    continue
+                # Save original
+                original_img_path = 'static/captured/captured_image.jpg'
+                cv2.imwrite(original_img_path, frame)
+                description_text, adjusted, audio_filename = describe_frame(frame)
+                adjusted_img_path = 'static/captured/adjusted_captured_image.jpg'
+                cv2.imwrite(adjusted_img_path, adjusted)
+
+                return description_text, adjusted_img_path, audio_filename
+
+            elif key == 27:
+                break
+    finally:
+        camera_service.release()
+        cv2.destroyAllWindows()
+    return "", "", ""
@@ -1,10 +1,10 @@
 import cv2
-import torch
 import pyttsx3
 import time
 import threading
 import numpy as np
-from ultralytics import YOLO
+from services.camera import camera_service
+from services.model_registry import get_yolov8
 
 def preprocess_frame(frame):
     """Tiền xử lý nhẹ giữ nguyên màu sắc"""
@@ -14,55 +14,73 @@ def preprocess_frame(frame):
     enhanced_hsv = cv2.merge([h, s, v])
     return cv2.cvtColor(enhanced_hsv, cv2.COLOR_HSV2BGR)
 
+# The shared ultralytics predictor is not thread-safe; frame ingest runs one
+# call per session on several workers, so inference is serialized here
+_model_lock = threading.Lock()
+
+
+def detect_frame(frame, min_confidence=0.5):
+    """Runs YOLO on one frame and returns [(class_name, confidence, (x1, y1, x2, y2)), ...]."""
+    model = get_yolov8()
+    with _model_lock:
+        results = model(frame, verbose=False)
+    detections = []
+    for result in results:
+        for box in result.boxes:
+            if box.conf >= min_confidence:
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                detections.append((model.names[int(box.cls)], box.conf.item(), (x1, y1, x2, y2)))
+    return detections
+
+
 def object_detection():
-    model = YOLO('yolov8m.pt')
-    model.conf = 0.5
-    
     tts_engine = pyttsx3.init()
     def speak(txt):
         tts_engine.say(txt)
         tts_engine.runAndWait()
 
-    cap = cv2.VideoCapture(0)
+    try:
+        camera_service.acquire()
+    except RuntimeError:
+        return []
+
     last_speech = 0
     speech_interval = 5
     detected_objects = []
 
-    while True:
-        ret, frame = cap.read()
-        if not ret: break
+    frame_id = 0
+    try:
+        while True:
+            try:
+                frame_id, frame = camera_service.read(frame_id)
+            except RuntimeError:
+                break
+            # Frame từ camera chỉ đọc được, vẽ lên bản sao
+            frame = frame.copy()
 
-        results = model(frame, verbose=False)
-        current_frame_objects = []
+            detections = detect_frame(frame)
+            current_frame_objects = []
 
-        
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                if box.conf >= 0.5:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    class_name = model.names[int(box.cls)]
-                    current_frame_objects.append(class_name)
-                    confidence = box.conf.item()
-                    
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(frame, f"{class_name} {confidence:.2f}", 
-                              (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 
-                              (0,255,0), 2)
+            for class_name, confidence, (x1, y1, x2, y2) in detections:
+                current_frame_objects.append(class_name)
 
-        detected_objects = current_frame_objects
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(frame, f"{class_name} {confidence:.2f}", 
+                          (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 
+                          (0,255,0), 2)
 
-        now = time.time()
-        if now - last_speech > speech_interval:
-            last_speech = now
-            labels = [model.names[int(box.cls)] for box in results[0].boxes if box.conf >= 0.5]
-            if labels:
-                threading.Thread(target=speak, args=(f"I see {', '.join(labels)}",)).start()
+            detected_objects = current_frame_objects
 
-        cv2.imshow('Detection (Press C to quit)', frame)
-        if cv2.waitKey(1) & 0xFF == ord('c'):
-            break
+            now = time.time()
+            if now - last_speech > speech_interval:
+                last_speech = now
+                if current_frame_objects:
+                    threading.Thread(target=speak, args=(f"I see {', '.join(current_frame_objects)}",)).start()
 
-    cap.release()
-    cv2.destroyAllWindows()
-    return detected_objects
\ No newline at end of file
+            cv2.imshow('Detection (Press C to quit)', frame)
+            if cv2.waitKey(1) & 0xFF == ord('c'):
+                break
+    finally:
+        camera_service.release()
+        cv2.destroyAllWindows()
+    return detected_objects
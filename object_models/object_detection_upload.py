@@ -1,33 +1,24 @@
-from gtts import gTTS
-import torch
 from PIL import Image
-import os
 from datetime import datetime
-from transformers import BlipProcessor, BlipForConditionalGeneration
 from flask import Flask
+from services.caption_batcher import caption_batcher
+from services.caption_cache import caption_cache
+from services.tts import synthesize_speech
 
 app = Flask(__name__)
 
 app.config['AUDIO_FOLDER'] = 'static/audio'
 
-processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-caption_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-
 def detect_objects(image_path):
-    
     raw = Image.open(image_path).convert("RGB")
-    inputs = processor(raw, return_tensors="pt")
-    out = caption_model.generate(**inputs)
-    description_text = processor.decode(out[0], skip_special_tokens=True).capitalize()
+    # Re-uploads and near-duplicates reuse the cached caption; otherwise the image is
+    # captioned together with concurrent requests in one batched generate call
+    description_text = caption_cache.get_or_create(raw, caption_batcher.caption).capitalize()
 
     # Generate audio from text
         
     timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
     
-    tts = gTTS(description_text, lang='en')
-
-    audio_path = os.path.join(app.config['AUDIO_FOLDER'] ,  f'desciption_{timestamp}.mp3' )
-
-    tts.save(audio_path)
+    audio_path = synthesize_speech(description_text, lang='en')
     
     return description_text, audio_path, timestamp
@@ -0,0 +1,83 @@
+"""Accuracy/latency comparison of the eager BLIP captioner and the optimized backend.
+
+    python -m services.blip_benchmark photo1.jpg photo2.jpg --backend onnx --runs 3
+
+Captions of the eager model are the reference: the report gives the share of
+identical captions and the mean token F1 against them, plus per-image latency
+of both backends.
+"""
+import argparse
+import statistics
+import time
+
+import torch
+from PIL import Image
+
+from services.model_registry import _load_caption_model
+
+
+def token_f1(reference, candidate):
+    reference, candidate = reference.lower().split(), candidate.lower().split()
+    common = sum(min(reference.count(word), candidate.count(word)) for word in set(candidate))
+    if not common:
+        return 0.0
+    precision, recall = common / len(candidate), common / len(reference)
+    return 2 * precision * recall / (precision + recall)
+
+
+def caption_all(processor, caption_model, images, runs):
+    """Returns (captions, per-image latencies in seconds), best of `runs` per image."""
+    captions, latencies = [], []
+    for image in images:
+        pixel_values = processor(images=image, return_tensors="pt")['pixel_values']
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            # Same mode as production (caption_batcher): no autograd bookkeeping
+            with torch.inference_mode():
+                out = caption_model.generate(pixel_values=pixel_values)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        captions.append(processor.decode(out[0], skip_special_tokens=True).strip())
+        latencies.append(best)
+    return captions, latencies
+
+
+def describe(latencies):
+    return f"mean {statistics.mean(latencies) * 1000:.0f} ms, p50 {statistics.median(latencies) * 1000:.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', nargs='+')
+    parser.add_argument('--backend', default='onnx', choices=('onnx', 'openvino'))
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    images = [Image.open(path).convert('RGB') for path in args.images]
+
+    processor, eager_model = _load_caption_model('eager')
+    # One untimed call so lazy initialization is not measured
+    caption_all(processor, eager_model, images[:1], 1)
+    reference, eager_latencies = caption_all(processor, eager_model, images, args.runs)
+    del eager_model
+
+    _, optimized_model = _load_caption_model(args.backend)
+    caption_all(processor, optimized_model, images[:1], 1)
+    captions, optimized_latencies = caption_all(processor, optimized_model, images, args.runs)
+
+    for path, expected, caption in zip(args.images, reference, captions):
+        marker = '=' if expected == caption else '~'
+        print(f"{marker} {path}\n    eager:  {expected}\n    {args.backend}: {caption}")
+
+    exact = sum(expected == caption for expected, caption in zip(reference, captions)) / len(images)
+    f1 = statistics.mean(token_f1(expected, caption) for expected, caption in zip(reference, captions))
+    speedup = statistics.mean(eager_latencies) / statistics.mean(optimized_latencies)
+    print(f"\nimages: {len(images)}")
+    print(f"eager:  {describe(eager_latencies)}")
+    print(f"{args.backend}: {describe(optimized_latencies)} ({speedup:.2f}x)")
+    print(f"identical captions: {exact:.0%}, mean token F1 vs eager: {f1:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Optimized BLIP captioning backend for CPU-only nodes.
+
+The vision encoder is exported once to ONNX and run with ONNX Runtime or
+OpenVINO; the text decoder gets dynamic int8 quantization of its Linear
+layers. The image embeddings are computed once per batch and handed to
+`text_decoder.generate`, whose cross-attention cache then reuses them for
+every decoding step.
+
+Select it with CLEARIFY_CAPTION_BACKEND=onnx (or openvino); the default,
+`eager`, keeps the plain BlipForConditionalGeneration model. Compare both
+with:
+    python -m services.blip_benchmark <images...>
+"""
+import os
+
+import numpy as np
+
+MODEL_CACHE = os.environ.get('CLEARIFY_MODEL_CACHE', 'model_cache')
+BACKENDS = ('eager', 'onnx', 'openvino')
+
+
+def vision_encoder_path(model_name):
+    return os.path.join(MODEL_CACHE, f"{model_name.replace('/', '--')}-vision.onnx")
+
+
+def export_vision_encoder(caption_model, path):
+    """Exports BLIP's vision encoder (pixel_values -> image_embeds) to ONNX."""
+    import torch
+
+    class VisionEncoder(torch.nn.Module):
+        def __init__(self, vision_model):
+            super().__init__()
+            self.vision_model = vision_model
+
+        def forward(self, pixel_values):
+            return self.vision_model(pixel_values=pixel_values)[0]
+
+    image_size = caption_model.config.vision_config.image_size
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with torch.no_grad():
+        torch.onnx.export(
+            VisionEncoder(caption_model.vision_model).eval(),
+            torch.zeros(1, 3, image_size, image_size),
+            tmp_path,
+            input_names=['pixel_values'],
+            output_names=['image_embeds'],
+            dynamic_axes={'pixel_values': {0: 'batch'}, 'image_embeds': {0: 'batch'}},
+            opset_version=14,
+        )
+    os.replace(tmp_path, path)
+
+
+def _onnx_runner(path):
+    import onnxruntime
+    session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+    return lambda pixel_values: session.run(None, {'pixel_values': pixel_values})[0]
+
+
+def _openvino_runner(path):
+    import openvino
+    compiled = openvino.Core().compile_model(path, 'CPU')
+    output = compiled.output(0)
+    return lambda pixel_values: compiled(pixel_values)[output]
+
+
+class OptimizedCaptioner:
+    """Drop-in for BlipForConditionalGeneration.generate(pixel_values=...)."""
+
+    def __init__(self, caption_model, encoder, backend):
+        import torch
+
+        self.backend = backend
+        self.config = caption_model.config
+        self._encode = encoder
+        self.text_decoder = torch.quantization.quantize_dynamic(
+            caption_model.text_decoder, {torch.nn.Linear}, dtype=torch.qint8)
+        self.text_decoder.eval()
+
+    def encode(self, pixel_values):
+        """Image embeddings from the exported vision encoder."""
+        import torch
+        embeds = self._encode(np.ascontiguousarray(pixel_values.numpy(), dtype=np.float32))
+        return torch.from_numpy(np.asarray(embeds))
+
+    def generate(self, pixel_values, **generate_kwargs):
+        import torch
+
+        # Same decoding setup as BlipForConditionalGeneration.generate, with the
+        # encoder output computed once and reused by every decoding step
+        with torch.inference_mode():
+            image_embeds = self.encode(pixel_values)
+            image_attention_mask = torch.ones(image_embeds.shape[:-1], dtype=torch.long)
+            text_config = self.config.text_config
+            input_ids = torch.LongTensor([[text_config.bos_token_id]]).repeat(image_embeds.shape[0], 1)
+            return self.text_decoder.generate(
+                input_ids=input_ids,
+                eos_token_id=text_config.sep_token_id,
+                pad_token_id=text_config.pad_token_id,
+                encoder_hidden_states=image_embeds,
+                encoder_attention_mask=image_attention_mask,
+                **generate_kwargs,
+            )
+
+
+def optimize_caption_model(caption_model, model_name, backend):
+    """Wraps an eager BLIP model into the optimized backend (exporting the encoder once)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown caption backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    if backend == 'eager':
+        return caption_model
+    path = vision_encoder_path(model_name)
+    if not os.path.exists(path):
+        export_vision_encoder(caption_model, path)
+    runner = _onnx_runner(path) if backend == 'onnx' else _openvino_runner(path)
+    return OptimizedCaptioner(caption_model, runner, backend)
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+
+import cv2
+
+
+# One background thread owns the camera and keeps grabbing into a small ring
+# of preallocated buffers. Consumers get read-only views of the latest frame
+# instead of opening the device themselves, so several routes can share one
+# camera and no request pays the device open/close latency.
+class CameraService:
+    def __init__(self, device=0, buffer_size=4, idle_seconds=60.0):
+        self.device = device
+        self.buffer_size = buffer_size
+        self.idle_seconds = idle_seconds
+
+        self._thread = None
+        self._running = False
+        self._buffers = [None] * buffer_size
+        self._frame_id = 0
+        self._latest_slot = None
+        self._users = 0
+        self._last_release = 0.0
+        self._error = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._frame_ready = threading.Condition(self._lock)
+
+    def acquire(self):
+        with self._lock:
+            self._users += 1
+            if self._running:
+                return
+            cap = cv2.VideoCapture(self.device)
+            if not cap.isOpened():
+                self._users -= 1
+                raise RuntimeError("Could not access the camera")
+            self._error = None
+            self._running = True
+            self._generation += 1
+            self._thread = threading.Thread(target=self._grab_loop, args=(cap, self._generation),
+                                            name='camera-grabber', daemon=True)
+            self._thread.start()
+
+    def release(self):
+        with self._lock:
+            self._users = max(self._users - 1, 0)
+            self._last_release = time.monotonic()
+
+    def read(self, after_id=0, timeout=2.0):
+        """Waits for a frame newer than `after_id` and returns (frame_id, frame).
+
+        The frame is a read-only view into the ring buffer; it stays valid until
+        the grabber wraps around (`buffer_size` frames later). Copy it to keep
+        it longer or to draw on it.
+        """
+        deadline = time.monotonic() + timeout
+        with self._frame_ready:
+            while self._frame_id <= after_id or self._latest_slot is None:
+                if self._error is not None:
+                    raise RuntimeError(self._error)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    raise RuntimeError("Failed to capture image")
+                self._frame_ready.wait(remaining)
+            view = self._buffers[self._latest_slot].view()
+            view.flags.writeable = False
+            return self._frame_id, view
+
+    def burst(self, count=5, after_id=0, timeout=2.0):
+        """Reads `count` consecutive new frames; returns (last_frame_id, [copies])."""
+        frames = []
+        for _ in range(count):
+            after_id, frame = self.read(after_id, timeout)
+            frames.append(frame.copy())
+        return after_id, frames
+
+    def _grab_loop(self, cap, generation):
+        # The grabber thread owns `cap` and is the only one to read or release it
+        slot = 0
+        try:
+            while True:
+                with self._lock:
+                    if generation != self._generation or not self._running:
+                        return
+                    if self._users == 0 and time.monotonic() - self._last_release > self.idle_seconds:
+                        self._stop_locked()
+                        return
+                    buffer = self._buffers[slot]
+                # Grab into the next slot; OpenCV reuses the array when the size matches
+                ok, frame = cap.read(buffer)
+                with self._frame_ready:
+                    if generation != self._generation:
+                        return
+                    if not ok:
+                        self._error = "Failed to capture image"
+                        self._stop_locked()
+                        return
+                    self._buffers[slot] = frame
+                    self._latest_slot = slot
+                    self._frame_id += 1
+                    self._frame_ready.notify_all()
+                slot = (slot + 1) % self.buffer_size
+        finally:
+            cap.release()
+
+    def _stop_locked(self):
+        self._running = False
+        self._generation += 1
+        self._buffers = [None] * self.buffer_size
+        self._latest_slot = None
+        self._frame_ready.notify_all()
+
+    def stop(self):
+        with self._lock:
+            self._stop_locked()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=2.0)
+
+    def status(self):
+        with self._lock:
+            return {
+                'running': self._running,
+                'users': self._users,
+                'frames': self._frame_id,
+                'error': self._error,
+            }
+
+
+camera_service = CameraService(
+    device=int(os.environ.get('CLEARIFY_CAMERA_DEVICE', 0)),
+    idle_seconds=float(os.environ.get('CLEARIFY_CAMERA_IDLE_SECONDS', 60)),
+)
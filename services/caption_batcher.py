@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from services.micro_batcher import MicroBatcher
+from services.model_registry import get_caption_model
+
+
+# Dynamic batching for BLIP captions: images are preprocessed by the
+# BlipProcessor on a thread pool, then a single worker collects whatever is
+# ready within a short window and runs one `generate` call for the whole
+# batch. Each request gets a future with its caption.
+class CaptionBatcher(MicroBatcher):
+    thread_name = 'caption-batcher'
+
+    def __init__(self, max_batch_size=8, window_ms=30, preprocess_workers=2):
+        super().__init__(max_batch_size, window_ms)
+        self._preprocess = ThreadPoolExecutor(max_workers=preprocess_workers, thread_name_prefix='caption-preprocess')
+
+    def submit(self, image):
+        """Queues a PIL RGB image and returns a Future resolving to its caption."""
+        future = Future()
+        self._preprocess.submit(self._prepare, image, future)
+        return future
+
+    def caption(self, image, timeout=None):
+        return self.submit(image).result(timeout=timeout)
+
+    def _prepare(self, image, future):
+        try:
+            processor, _ = get_caption_model()
+            pixel_values = processor(images=image, return_tensors="pt")['pixel_values']
+        except Exception as e:
+            future.set_exception(e)
+            return
+        self._enqueue((pixel_values, future))
+
+    def _process(self, batch):
+        import torch
+
+        batch = [(pixel_values, future) for pixel_values, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            processor, caption_model = get_caption_model()
+            pixel_values = torch.cat([pixel_values for pixel_values, _ in batch])
+            with torch.inference_mode():
+                out = caption_model.generate(pixel_values=pixel_values)
+            captions = processor.batch_decode(out, skip_special_tokens=True)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), caption in zip(batch, captions):
+            future.set_result(caption.strip())
+
+
+caption_batcher = CaptionBatcher(
+    max_batch_size=int(os.environ.get('CLEARIFY_CAPTION_MAX_BATCH', 8)),
+    window_ms=float(os.environ.get('CLEARIFY_CAPTION_BATCH_WINDOW_MS', 30)),
+    preprocess_workers=int(os.environ.get('CLEARIFY_CAPTION_PREPROCESS_WORKERS', 2)),
+)
@@ -0,0 +1,206 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from services.frame_change import difference_hash, hamming
+
+
+CACHE_PATH = os.path.join(os.environ.get('CLEARIFY_MODEL_CACHE', 'model_cache'), 'captions.sqlite3')
+
+
+def image_keys(image):
+    """(exact key, perceptual dHash) of a PIL image."""
+    digest = hashlib.sha256(f'{image.mode}\0{image.size}\0'.encode('ascii'))
+    digest.update(image.tobytes())
+    return digest.hexdigest(), difference_hash(np.asarray(image.convert('L')))
+
+
+def hash_bands(count, bits=64):
+    """(bit offset, width) of `count` near-equal bands covering a `bits`-bit hash."""
+    count = min(count, bits)
+    bounds = [bits * band // count for band in range(count + 1)]
+    return [(start, end - start) for start, end in zip(bounds, bounds[1:])]
+
+
+# Caption cache for repeated uploads and near-identical captured frames.
+# Entries are keyed by the SHA-256 of the decoded pixels; with a non-zero
+# `max_distance` an image whose 64-bit dHash is within that Hamming distance
+# of a cached one reuses its caption too. That is off by default: a 9x8 dHash
+# is coarse, and a different scene a few bits away would be described with
+# another image's caption. Near-duplicates are looked up in a banded index: the
+# hash is split into more bands than `max_distance`, so any hash within that
+# distance matches at least one band exactly, and only entries sharing a band
+# are compared. Recent entries live in an in-memory LRU, everything
+# is kept in SQLite so the cache survives restarts; hits update `last_used` in
+# batches. The spoken audio is cached by text separately, so a caption hit is
+# a TTS hit.
+class CaptionCache:
+    def __init__(self, path=CACHE_PATH, max_memory=1024, max_entries=50000, max_distance=0, flush_every=64):
+        self.path = path
+        self.max_memory = max_memory
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.flush_every = flush_every
+        self._memory = OrderedDict()  # key -> (caption, seconds)
+        self._hashes = {}  # key -> dHash of every stored entry, for near-duplicate lookups
+        # (bit offset, width) of each band, and per band: band value -> keys
+        self._bands = hash_bands(max(8, max_distance + 1)) if max_distance > 0 else []
+        self._band_index = [{} for _ in self._bands]
+        self._touched = {}  # key -> last use not yet written to SQLite
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS captions ('
+                         'key TEXT PRIMARY KEY, phash TEXT, caption TEXT, seconds REAL, last_used REAL)')
+        self._db.commit()
+        for key, phash in self._db.execute('SELECT key, phash FROM captions'):
+            self._add_hash(key, int(phash, 16))
+
+    def get_or_create(self, image, generate):
+        """Returns the caption of a PIL image, calling `generate(image)` on a miss."""
+        key, phash = image_keys(image)
+        caption = self._lookup(key, phash)
+        if caption is not None:
+            return caption
+
+        # One caption per image: concurrent requests for the same image wait for the first
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            caption = self._lookup(key, phash, count_miss=True)
+            if caption is not None:
+                return caption
+            start = time.perf_counter()
+            caption = generate(image)
+            self._store(key, phash, caption, time.perf_counter() - start)
+            with self._lock:
+                self._key_locks.pop(key, None)
+        return caption
+
+    def _lookup(self, key, phash, count_miss=False):
+        with self._lock:
+            found = self._find(key, phash)
+            if found is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            found_key, (caption, seconds) = found
+            if found_key == key:
+                self.exact_hits += 1
+            else:
+                self.near_hits += 1
+            self.seconds_saved += seconds
+            self._touched[found_key] = time.time()
+            if len(self._touched) >= self.flush_every:
+                self._flush_touched()
+                self._db.commit()
+            return caption
+
+    def _find(self, key, phash):
+        # Exact match first (memory, then disk), then the closest near-duplicate
+        candidates = [key]
+        if self.max_distance > 0:
+            distance, near_key = min(((hamming(phash, self._hashes[other_key]), other_key)
+                                      for other_key in self._band_neighbours(phash) if other_key != key),
+                                     default=(None, None))
+            if distance is not None and distance <= self.max_distance:
+                candidates.append(near_key)
+        for candidate in candidates:
+            entry = self._memory.get(candidate)
+            if entry is None:
+                row = self._db.execute('SELECT caption, seconds FROM captions WHERE key = ?',
+                                       (candidate,)).fetchone()
+                if row is None:
+                    continue
+                entry = tuple(row)
+            self._remember(candidate, entry)
+            return candidate, entry
+        return None
+
+    def _band_values(self, phash):
+        return [(phash >> offset) & ((1 << width) - 1) for offset, width in self._bands]
+
+    def _band_neighbours(self, phash):
+        """Keys sharing at least one band with `phash`: every hash within `max_distance` is among them."""
+        neighbours = set()
+        for index, value in zip(self._band_index, self._band_values(phash)):
+            neighbours.update(index.get(value, ()))
+        return neighbours
+
+    def _add_hash(self, key, phash):
+        self._remove_hash(key)
+        self._hashes[key] = phash
+        for index, value in zip(self._band_index, self._band_values(phash)):
+            index.setdefault(value, set()).add(key)
+
+    def _remove_hash(self, key):
+        phash = self._hashes.pop(key, None)
+        if phash is None:
+            return
+        for index, value in zip(self._band_index, self._band_values(phash)):
+            keys = index.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self):
+        self._db.executemany('UPDATE captions SET last_used = ? WHERE key = ?',
+                             [(used, key) for key, used in self._touched.items()])
+        self._touched.clear()
+
+    def _store(self, key, phash, caption, seconds):
+        with self._lock:
+            # Pending last_used updates go in with this commit (and before any eviction)
+            self._flush_touched()
+            self._remember(key, (caption, seconds))
+            self._add_hash(key, phash)
+            self._db.execute('INSERT OR REPLACE INTO captions VALUES (?, ?, ?, ?, ?)',
+                             (key, f'{phash:016x}', caption, seconds, time.time()))
+            if len(self._hashes) > self.max_entries:
+                # Drop the least recently used tenth in one go
+                stale = [row[0] for row in self._db.execute(
+                    'SELECT key FROM captions ORDER BY last_used LIMIT ?', (self.max_entries // 10 or 1,))]
+                self._db.executemany('DELETE FROM captions WHERE key = ?', [(stale_key,) for stale_key in stale])
+                for stale_key in stale:
+                    self._remove_hash(stale_key)
+                    self._memory.pop(stale_key, None)
+            self._db.commit()
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                'exact_hits': self.exact_hits,
+                'near_duplicate_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.exact_hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+                'seconds_saved': round(self.seconds_saved, 3),
+                'memory_entries': len(self._memory),
+                'entries': len(self._hashes),
+            }
+
+
+caption_cache = CaptionCache(
+    path=os.environ.get('CLEARIFY_CAPTION_CACHE', CACHE_PATH),
+    max_entries=int(os.environ.get('CLEARIFY_CAPTION_CACHE_MAX_ENTRIES', 50000)),
+    max_distance=int(os.environ.get('CLEARIFY_CAPTION_HASH_DISTANCE', 0)),
+)
@@ -0,0 +1,91 @@
+import time
+
+import cv2
+import numpy as np
+
+from services.frame_quality import sharpness
+
+
+def thumbnail(gray, size=32):
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def difference_hash(gray):
+    """64-bit dHash: compares horizontally adjacent pixels of a 9x8 thumbnail."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+# Decides whether a live frame is worth sending to OCR: only when the content
+# changed since the last OCR'd frame, or the same content became noticeably
+# sharper. While the camera is moving frames are skipped, and the minimum gap
+# between OCR runs follows the measured OCR latency instead of a fixed count.
+class ChangeDetector:
+    def __init__(self, change_threshold=12.0, hash_threshold=10, motion_threshold=8.0,
+                 sharpness_gain=1.5, min_interval=0.2, max_interval=3.0):
+        self.change_threshold = change_threshold
+        self.hash_threshold = hash_threshold
+        self.motion_threshold = motion_threshold
+        self.sharpness_gain = sharpness_gain
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+        self.ocr_latency = 0.0
+        self.last_reason = None
+        self._previous_thumb = None
+        self._ocr_thumb = None
+        self._ocr_hash = None
+        self._ocr_sharpness = 0.0
+        self._last_ocr_time = 0.0
+        self.checked = 0
+        self.accepted = 0
+
+    def record_ocr_latency(self, seconds):
+        # Exponential moving average of how long one OCR run takes
+        self.ocr_latency = seconds if not self.ocr_latency else 0.7 * self.ocr_latency + 0.3 * seconds
+
+    def interval(self):
+        return min(max(self.ocr_latency * 1.5, self.min_interval), self.max_interval)
+
+    def should_ocr(self, frame, now=None):
+        now = time.monotonic() if now is None else now
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        thumb = thumbnail(gray)
+        self.checked += 1
+
+        motion = float(np.mean(np.abs(thumb - self._previous_thumb))) if self._previous_thumb is not None else 0.0
+        self._previous_thumb = thumb
+
+        if now - self._last_ocr_time < self.interval():
+            self.last_reason = 'interval'
+            return False
+        if motion > self.motion_threshold:
+            # Wait for the camera to settle, a moving frame is blurry anyway
+            self.last_reason = 'motion'
+            return False
+
+        frame_hash = difference_hash(gray)
+        frame_sharpness = sharpness(gray)
+        if self._ocr_thumb is None:
+            reason = 'first'
+        elif float(np.mean(np.abs(thumb - self._ocr_thumb))) > self.change_threshold \
+                or hamming(frame_hash, self._ocr_hash) > self.hash_threshold:
+            reason = 'changed'
+        elif frame_sharpness > self._ocr_sharpness * self.sharpness_gain:
+            reason = 'sharper'
+        else:
+            self.last_reason = 'unchanged'
+            return False
+
+        self.last_reason = reason
+        self.accepted += 1
+        self._ocr_thumb = thumb
+        self._ocr_hash = frame_hash
+        self._ocr_sharpness = frame_sharpness
+        self._last_ocr_time = now
+        return True
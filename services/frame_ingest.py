@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+# Frames posted by the browser (getUserMedia -> JPEG/WebP) are processed on a
+# small thread pool, so the Flask worker that received the upload returns at
+# once. Each (mode, session) keeps at most one frame in flight and one waiting:
+# a newer frame replaces the waiting one, so a slow model never builds a
+# backlog. Clients poll for the latest result.
+class FrameIngest:
+    def __init__(self, max_workers=2, session_ttl=300):
+        self.session_ttl = session_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='frame-ingest')
+        self._handlers = {}
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+        self._received = 0
+        self._processed = 0
+        self._dropped = 0
+        self._busy_seconds = 0.0
+
+    def register(self, mode, handler):
+        """`handler(frame, context)` gets a BGR image and returns a JSON-serializable result.
+
+        `context` is a dict kept per (mode, session) for state across frames.
+        """
+        self._handlers[mode] = handler
+
+    def modes(self):
+        return list(self._handlers)
+
+    def submit(self, mode, session_id, data):
+        key = (mode, session_id)
+        now = time.monotonic()
+        with self._lock:
+            self._expire_sessions(now)
+            state = self._sessions.setdefault(key, {
+                'seq': 0, 'busy': False, 'waiting': None, 'result': None, 'last_seen': now, 'context': {},
+            })
+            state['seq'] += 1
+            state['last_seen'] = now
+            seq = state['seq']
+            self._received += 1
+
+            if state['busy']:
+                if state['waiting'] is not None:
+                    self._dropped += 1
+                state['waiting'] = (seq, data)
+                return {'frame': seq, 'status': 'waiting'}
+            state['busy'] = True
+
+        self._executor.submit(self._process, key, seq, data)
+        return {'frame': seq, 'status': 'processing'}
+
+    def result(self, mode, session_id, after=0):
+        """Returns the latest result newer than frame `after`, or None."""
+        with self._lock:
+            state = self._sessions.get((mode, session_id))
+            if state is None:
+                return None
+            state['last_seen'] = time.monotonic()
+            payload = state['result']
+            if payload is None or payload['frame'] <= after:
+                return None
+            return payload
+
+    def _process(self, key, seq, data):
+        handler = self._handlers[key[0]]
+        with self._lock:
+            context = self._sessions[key]['context']
+        while True:
+            start = time.perf_counter()
+            try:
+                frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if frame is None:
+                    raise ValueError("Could not decode the uploaded frame")
+                payload = {'frame': seq, 'result': handler(frame, context)}
+            except Exception as e:
+                print(f"Frame processing failed ({key[0]}): {e}")
+                payload = {'frame': seq, 'error': str(e)}
+            elapsed = time.perf_counter() - start
+            payload['processing_ms'] = round(elapsed * 1000, 1)
+
+            with self._lock:
+                self._processed += 1
+                self._busy_seconds += elapsed
+                state = self._sessions.get(key)
+                if state is None:
+                    return
+                state['result'] = payload
+                if state['waiting'] is None:
+                    state['busy'] = False
+                    return
+                (seq, data), state['waiting'] = state['waiting'], None
+
+    def _expire_sessions(self, now):
+        expired = [key for key, state in self._sessions.items()
+                   if not state['busy'] and now - state['last_seen'] > self.session_ttl]
+        for key in expired:
+            del self._sessions[key]
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'frames_received': self._received,
+                'frames_processed': self._processed,
+                'frames_dropped': self._dropped,
+                'mean_processing_ms': round(self._busy_seconds / self._processed * 1000, 1) if self._processed else 0.0,
+            }
+
+
+frame_ingest = FrameIngest(max_workers=int(os.environ.get('CLEARIFY_FRAME_WORKERS', 2)))
@@ -0,0 +1,106 @@
+import os
+import threading
+from collections import Counter
+
+import cv2
+import numpy as np
+
+
+def downscale(gray, width=320):
+    if gray.shape[1] <= width:
+        return gray
+    scale = width / gray.shape[1]
+    return cv2.resize(gray, (width, max(int(gray.shape[0] * scale), 1)), interpolation=cv2.INTER_AREA)
+
+
+def sharpness(gray, width=320):
+    # Laplacian variance on a downscaled copy: cheap and stable across resolutions
+    return float(cv2.Laplacian(downscale(gray, width), cv2.CV_64F).var())
+
+
+def score_frame(frame, width=320):
+    """Cheap quality statistics of a BGR frame, all computed on a 320px wide copy."""
+    small = downscale(frame, width)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel() / gray.size
+    if small.ndim == 3:
+        # Glare: blown-out, colourless pixels (specular reflections on glossy paper or screens)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+        glare = float(np.mean((hsv[..., 2] >= 250) & (hsv[..., 1] <= 30)))
+    else:
+        glare = float(histogram[250:].sum())
+    return {
+        'sharpness': float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+        'brightness': float(np.dot(histogram, np.arange(256))),
+        'dark_fraction': float(histogram[:30].sum()),
+        'bright_fraction': float(histogram[226:].sum()),
+        'glare': glare,
+    }
+
+
+# Rejects frames that are not worth sending to OCR or captioning: motion blur,
+# under/over-exposure and strong glare. Each rejection has a reason so callers
+# can report why a frame was skipped; `best_of` picks the sharpest acceptable
+# frame of a short burst.
+class QualityGate:
+    def __init__(self, min_sharpness=60.0, min_brightness=40.0, max_brightness=220.0,
+                 max_dark_fraction=0.7, max_glare=0.08):
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_dark_fraction = max_dark_fraction
+        self.max_glare = max_glare
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._rejected = Counter()
+
+    def reason(self, scores):
+        """Returns why a frame with these scores is rejected, or None if it is acceptable."""
+        if scores['brightness'] < self.min_brightness or scores['dark_fraction'] > self.max_dark_fraction:
+            return 'underexposed'
+        if scores['brightness'] > self.max_brightness:
+            return 'overexposed'
+        if scores['glare'] > self.max_glare:
+            return 'glare'
+        if scores['sharpness'] < self.min_sharpness:
+            return 'blurry'
+        return None
+
+    def check(self, frame):
+        """Returns (accepted, reason, scores) for one frame."""
+        scores = score_frame(frame)
+        reason = self.reason(scores)
+        with self._lock:
+            self._checked += 1
+            if reason:
+                self._rejected[reason] += 1
+        return reason is None, reason, scores
+
+    def best_of(self, frames):
+        """Returns (frame, reason, scores) for the sharpest acceptable frame of a burst.
+
+        If every frame is rejected, the sharpest one is returned with its reason.
+        """
+        best = None
+        for frame in frames:
+            accepted, reason, scores = self.check(frame)
+            candidate = (accepted, scores['sharpness'], frame, reason, scores)
+            if best is None or candidate[:2] > best[:2]:
+                best = candidate
+        if best is None:
+            return None, 'no-frames', None
+        _, _, frame, reason, scores = best
+        return frame, reason, scores
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'checked': self._checked,
+                'rejected': sum(self._rejected.values()),
+                'rejected_by_reason': dict(self._rejected),
+            }
+
+
+# Text needs crisper frames than captioning or object detection
+text_quality_gate = QualityGate(min_sharpness=float(os.environ.get('CLEARIFY_TEXT_MIN_SHARPNESS', 60)))
+object_quality_gate = QualityGate(min_sharpness=float(os.environ.get('CLEARIFY_OBJECT_MIN_SHARPNESS', 25)))
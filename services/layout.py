@@ -0,0 +1,205 @@
+import bisect
+import itertools
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from services.ocr_result import OCRBlock, OCRLine, OCRResult, OCRWord
+
+
+def _span(box, text, score):
+    points = np.asarray(box, dtype=np.float32)
+    x1, y1 = points.min(axis=0)
+    x2, y2 = points.max(axis=0)
+    return {'rect': (float(x1), float(y1), float(x2), float(y2)), 'text': text, 'score': float(score)}
+
+
+def _round_rect(rect):
+    return [round(value, 1) for value in rect]
+
+
+def _union(rects):
+    rects = list(rects)
+    return (min(r[0] for r in rects), min(r[1] for r in rects),
+            max(r[2] for r in rects), max(r[3] for r in rects))
+
+
+def _words(span):
+    # The detector returns text lines; word boxes are split proportionally to characters
+    x1, y1, x2, y2 = span['rect']
+    text = span['text']
+    char_width = (x2 - x1) / max(len(text), 1)
+    words, offset = [], 0
+    for word in text.split():
+        start = text.index(word, offset)
+        offset = start + len(word)
+        words.append(OCRWord(text=word,
+                             box=_round_rect((x1 + start * char_width, y1, x1 + offset * char_width, y2)),
+                             confidence=round(span['score'], 4)))
+    return words
+
+
+def _columns(spans, gap):
+    """Splits spans into columns at vertical gutters wider than `gap` (interval merge)."""
+    spans = sorted(spans, key=lambda span: span['rect'][0])
+    columns = []
+    right = None
+    for span in spans:
+        x1, _, x2, _ = span['rect']
+        if right is None or x1 > right + gap:
+            columns.append([])
+            right = x2
+        else:
+            right = max(right, x2)
+        columns[-1].append(span)
+    return columns
+
+
+def _partner_share(spans, others, overlap):
+    """Share of `spans` that sit on the same text line as one of `others`."""
+    others = sorted(others, key=lambda span: span['rect'][1])
+    tops = [span['rect'][1] for span in others]
+    tallest = max(span['rect'][3] - span['rect'][1] for span in others)
+    partnered = 0
+    for span in spans:
+        _, y1, _, y2 = span['rect']
+        # Only spans starting within one line height can share the line
+        start = bisect.bisect_left(tops, y1 - tallest)
+        end = bisect.bisect_left(tops, y2)
+        if any(min(y2, other['rect'][3]) - max(y1, other['rect'][1])
+               >= overlap * min(y2 - y1, other['rect'][3] - other['rect'][1])
+               for other in others[start:end]):
+            partnered += 1
+    return partnered / len(spans)
+
+
+def _merge_table_columns(columns, overlap, rows=0.6, width_ratio=4.0):
+    """Joins neighbouring columns that are really table rows (receipts, price lists).
+
+    Columns are joined when most spans of the side with fewer spans share a line
+    with the other side, and the narrower side is less than `width_ratio` times
+    the gutter wide: prose columns are far wider than the gap between them, a
+    price or quantity column is not.
+    """
+    merged = [columns[0]]
+    for column in columns[1:]:
+        left = merged[-1]
+        left_rect, right_rect = _union(span['rect'] for span in left), _union(span['rect'] for span in column)
+        gutter = right_rect[0] - left_rect[2]
+        narrower = min(left_rect[2] - left_rect[0], right_rect[2] - right_rect[0])
+        fewer, more = sorted((left, column), key=len)
+        if narrower < width_ratio * gutter and _partner_share(fewer, more, overlap) >= rows:
+            merged[-1] = left + column
+        else:
+            merged.append(column)
+    return merged
+
+
+def _lines(spans, overlap):
+    """Groups spans of one column into lines with a sweep over their tops."""
+    lines = []
+    for span in sorted(spans, key=lambda span: span['rect'][1]):
+        _, y1, _, y2 = span['rect']
+        if lines:
+            line = lines[-1]
+            top, bottom = line['top'], line['bottom']
+            shared = min(y2, bottom) - max(y1, top)
+            if shared >= overlap * min(y2 - y1, bottom - top):
+                line['spans'].append(span)
+                line['bottom'] = max(bottom, y2)
+                continue
+        lines.append({'top': y1, 'bottom': y2, 'spans': [span]})
+    return [sorted(line['spans'], key=lambda span: span['rect'][0]) for line in lines]
+
+
+def _line(spans):
+    line = OCRLine.from_words([word for span in spans for word in _words(span)])
+    # The line box covers the detected boxes, not only the word estimates
+    line.box = _round_rect(_union(span['rect'] for span in spans))
+    return line
+
+
+def analyze_layout(results, column_gap=1.5, block_gap=1.2, line_overlap=0.5, wide=0.6):
+    """Groups an `ocr.ocr` result into an OCRResult (blocks -> lines -> words), in reading order.
+
+    The page is cut into horizontal bands at full-width lines (titles), each band
+    into columns at vertical gutters, each column into lines and then blocks at
+    large vertical gaps; single-column bands in a row are read as one flow.
+    Columns whose spans pair up line by line across a wide gutter are table rows
+    (receipts) and are read row by row. Gaps are relative to the median text
+    height. Everything is sorts, binary searches and sweeps: O(n log n).
+    """
+    spans = [_span(word_info[0], *word_info[1]) for line in results or [] for word_info in line or []
+             if isinstance(word_info, (list, tuple)) and len(word_info) > 1 and word_info[1][0].strip()]
+    if not spans:
+        return OCRResult()
+
+    height = float(np.median([span['rect'][3] - span['rect'][1] for span in spans]))
+    page = _union(span['rect'] for span in spans)
+    page_width = max(page[2] - page[0], 1.0)
+
+    # Bands: full-width spans (titles) run across columns and separate bands
+    bands, current, current_wide = [], [], False
+    for span in sorted(spans, key=lambda span: span['rect'][1]):
+        is_wide = span['rect'][2] - span['rect'][0] >= wide * page_width
+        if current and is_wide != current_wide:
+            bands.append(current)
+            current = []
+        current.append(span)
+        current_wide = is_wide
+    bands.append(current)
+
+    # Neighbouring single-column bands are one flow of text (e.g. a paragraph's short last line)
+    merged = []
+    for band in bands:
+        columns = _merge_table_columns(_columns(band, column_gap * height), line_overlap)
+        if merged and len(columns) == 1 and len(merged[-1]) == 1:
+            merged[-1][0].extend(band)
+        else:
+            merged.append(columns)
+
+    blocks = []
+    ids = itertools.count()
+    for columns in merged:
+        for column, column_spans in enumerate(columns):
+            block_lines, previous_bottom = [], None
+            for line_spans in _lines(column_spans, line_overlap):
+                top = min(span['rect'][1] for span in line_spans)
+                if block_lines and top - previous_bottom > block_gap * height:
+                    blocks.append(OCRBlock.from_lines(next(ids), column, block_lines))
+                    block_lines = []
+                block_lines.append(_line(line_spans))
+                previous_bottom = max(span['rect'][3] for span in line_spans)
+            if block_lines:
+                blocks.append(OCRBlock.from_lines(next(ids), column, block_lines))
+    return OCRResult(blocks)
+
+
+def layout_lines(results):
+    """Line texts of an `ocr.ocr` result in reading order."""
+    return [line.text for line in analyze_layout(results).lines()]
+
+
+# Recent OCR results by id, so clients can pick which blocks of a page are spoken
+class LayoutStore:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._layouts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result):
+        layout_id = uuid.uuid4().hex
+        with self._lock:
+            self._layouts[layout_id] = result
+            while len(self._layouts) > self.max_entries:
+                self._layouts.popitem(last=False)
+        return layout_id
+
+    def get(self, layout_id):
+        with self._lock:
+            return self._layouts.get(layout_id)
+
+
+layout_store = LayoutStore()
@@ -0,0 +1,102 @@
+import queue
+import threading
+import time
+from collections import Counter
+
+
+# Base for the dynamic batching workers (OCR, captions): a single background
+# thread takes the first queued item, collects whatever else arrives within
+# a short window (up to `max_batch_size`) and hands the batch to `_process`.
+# Subclasses queue items with `_enqueue` and resolve their futures in
+# `_process`.
+class MicroBatcher:
+    thread_name = 'micro-batcher'
+
+    def __init__(self, max_batch_size=8, window_ms=20):
+        self.max_batch_size = max_batch_size
+        self.window_seconds = window_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self._started_at = None
+        self._requests = 0
+        self._batches = 0
+        self._busy_seconds = 0.0
+        self._batch_sizes = Counter()
+        self._last_batch_size = 0
+
+    def shutdown(self):
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _enqueue(self, item):
+        self._ensure_started()
+        self._queue.put(item)
+
+    def _process(self, batch):
+        raise NotImplementedError
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._started_at = time.monotonic()
+                self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch first, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                break
+            start = time.perf_counter()
+            self._process(batch)
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._busy_seconds += elapsed
+                self._batch_sizes[len(batch)] += 1
+                self._last_batch_size = len(batch)
+
+    def metrics(self):
+        with self._lock:
+            uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+            return {
+                'requests': self._requests,
+                'batches': self._batches,
+                'queue_depth': self._queue.qsize(),
+                'last_batch_size': self._last_batch_size,
+                'mean_batch_size': round(self._requests / self._batches, 2) if self._batches else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'requests_per_second': round(self._requests / uptime, 3) if uptime else 0.0,
+                'requests_per_busy_second': round(self._requests / self._busy_seconds, 3) if self._busy_seconds else 0.0,
+            }
@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+
+import psutil
+
+
+# Process-wide model registry: each model is loaded once, the first time a
+# route needs it, and every route shares that single instance.
+class ModelRegistry:
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._warmups = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._preload_names = []
+        self._preload_thread = None
+        self._preload_errors = {}
+
+    def register(self, name, loader, warmup=None):
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks[name] = threading.Lock()
+            if warmup is not None:
+                self._warmups[name] = warmup
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        # Double-checked locking: one thread loads, the others wait and reuse it
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            process = psutil.Process()
+            rss_before = process.memory_info().rss
+            start = time.perf_counter()
+            model = self._loaders[name]()
+            load_seconds = time.perf_counter() - start
+            rss_after = process.memory_info().rss
+
+            self._stats[name] = {
+                'load_seconds': round(load_seconds, 3),
+                # Approximate: RSS growth of the whole process while loading
+                'resident_mb': round(max(rss_after - rss_before, 0) / (1024 * 1024), 1),
+            }
+            self._models[name] = model
+            print(f"Loaded model '{name}' in {load_seconds:.2f}s")
+            return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def names(self):
+        return list(self._loaders)
+
+    def warmup(self, name):
+        """Loads the model if needed and runs one dummy inference through it."""
+        model = self.get(name)
+        start = time.perf_counter()
+        warmup = self._warmups.get(name)
+        if warmup is not None:
+            warmup(model)
+        warmup_seconds = time.perf_counter() - start
+        self._stats[name]['warmup_seconds'] = round(warmup_seconds, 3)
+        return warmup_seconds
+
+    def preload(self, names, background=True):
+        """Loads and warms up the given models, by default on a daemon thread.
+
+        The readiness gate (`is_ready`) waits for exactly these models.
+        """
+        self._preload_names = list(names)
+
+        def run():
+            for name in self._preload_names:
+                try:
+                    self.warmup(name)
+                except Exception as e:
+                    self._preload_errors[name] = str(e)
+                    print(f"Failed to preload model '{name}': {e}")
+
+        if not background:
+            run()
+            return
+        self._preload_thread = threading.Thread(target=run, name='model-preload', daemon=True)
+        self._preload_thread.start()
+
+    def is_ready(self):
+        # Without a preload list models are loaded lazily, so the worker is ready at once
+        return all(self.is_loaded(name) for name in self._preload_names)
+
+    def readiness(self):
+        return {
+            'ready': self.is_ready(),
+            'pending': [name for name in self._preload_names if not self.is_loaded(name)],
+            'errors': dict(self._preload_errors),
+        }
+
+    def stats(self):
+        return {
+            name: {'loaded': self.is_loaded(name), **self._stats.get(name, {})}
+            for name in self._loaders
+        }
+
+
+def _load_ocr():
+    from paddleocr import PaddleOCR
+    return PaddleOCR(use_angle_cls=True, lang='en')
+
+
+def _warmup_ocr(ocr):
+    import numpy as np
+    # Through the engine, which serializes every call into the shared predictors
+    from services.ocr_engine import ocr_engine
+    ocr_engine.warmup(np.full((64, 256, 3), 255, dtype=np.uint8))
+
+
+CAPTION_MODEL = "Salesforce/blip-image-captioning-base"
+
+
+def _load_caption_model(backend=None):
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+    from services.blip_optimized import optimize_caption_model
+    processor = BlipProcessor.from_pretrained(CAPTION_MODEL)
+    caption_model = BlipForConditionalGeneration.from_pretrained(CAPTION_MODEL)
+    caption_model.eval()
+    # eager (default), onnx or openvino; see services/blip_optimized.py
+    backend = backend or os.environ.get('CLEARIFY_CAPTION_BACKEND', 'eager')
+    return processor, optimize_caption_model(caption_model, CAPTION_MODEL, backend)
+
+
+def _warmup_caption_model(models):
+    from PIL import Image
+    processor, caption_model = models
+    inputs = processor(Image.new('RGB', (384, 384)), return_tensors="pt")
+    caption_model.generate(**inputs, max_new_tokens=5)
+
+
+def _load_sym_spell():
+    from services.symspell_snapshot import load_sym_spell
+    return load_sym_spell()
+
+
+def _warmup_sym_spell(sym_spell):
+    from symspellpy import Verbosity
+    sym_spell.lookup('helo', Verbosity.CLOSEST, max_edit_distance=2)
+
+
+def _warmup_yolo(model):
+    import numpy as np
+    model(np.zeros((320, 320, 3), dtype=np.uint8))
+
+
+def _warmup_yolov8(model):
+    import numpy as np
+    # The live detector shares this model across frame ingest workers; detect_frame holds its lock
+    from object_models.object_detection_live import detect_frame
+    detect_frame(np.zeros((320, 320, 3), dtype=np.uint8))
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+YOLOV5_SIZES = ('n', 's', 'm', 'l')
+
+
+def _load_yolov5(size=None):
+    import torch
+    size = size or os.environ.get('CLEARIFY_YOLOV5_SIZE', 'n')
+    if size not in YOLOV5_SIZES:
+        raise ValueError(f"Unknown YOLOv5 size '{size}', expected one of {', '.join(YOLOV5_SIZES)}")
+    # Built from the vendored yolov5/hubconf.py: no hub resolution. yolov5n.pt ships with the
+    # repo; other sizes are downloaded once next to it. Conv+BN are fused while loading.
+    weights = os.path.join(PROJECT_ROOT, f'yolov5{size}.pt')
+    return torch.hub.load(os.path.join(PROJECT_ROOT, 'yolov5'), 'custom', path=weights, source='local',
+                          autoshape=True)
+
+
+def _load_yolov8():
+    from ultralytics import YOLO
+    model = YOLO('yolov8m.pt')
+    model.conf = 0.5
+    return model
+
+
+registry = ModelRegistry()
+registry.register('ocr', _load_ocr, _warmup_ocr)
+registry.register('caption', _load_caption_model, _warmup_caption_model)
+registry.register('sym_spell', _load_sym_spell, _warmup_sym_spell)
+registry.register('yolov5', _load_yolov5, _warmup_yolo)
+registry.register('yolov8', _load_yolov8, _warmup_yolov8)
+
+
+def get_ocr():
+    return registry.get('ocr')
+
+
+def get_caption_model():
+    """Returns the BLIP (processor, caption_model) pair."""
+    return registry.get('caption')
+
+
+def get_sym_spell():
+    return registry.get('sym_spell')
+
+
+def get_yolov5():
+    return registry.get('yolov5')
+
+
+def get_yolov8():
+    return registry.get('yolov8')
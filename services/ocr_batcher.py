@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import Future
+
+from services.micro_batcher import MicroBatcher
+from services.ocr_engine import ocr_engine, crop_text_box, build_ocr_result
+
+
+# Micro-batching OCR worker: requests that arrive within a short window are
+# detected one image at a time, then all their text boxes go through a single
+# recognition call (through the engine's crop cache). Each request gets a
+# future with its own `ocr.ocr` result.
+class OCRBatcher(MicroBatcher):
+    thread_name = 'ocr-batcher'
+
+    def __init__(self, max_batch_size=8, window_ms=20, use_angle_cls=True):
+        super().__init__(max_batch_size, window_ms)
+        self.use_angle_cls = use_angle_cls
+
+    def submit(self, img):
+        """Queues an image and returns a Future resolving to the `ocr.ocr` result layout."""
+        future = Future()
+        self._enqueue((img, future))
+        return future
+
+    def ocr(self, img, timeout=None):
+        return self.submit(img).result(timeout=timeout)
+
+    def _process(self, batch):
+        batch = [(img, future) for img, future in batch if future.set_running_or_notify_cancel()]
+        try:
+            detected = []
+            crops = []
+            for img, future in batch:
+                try:
+                    boxes = ocr_engine.detect(img)
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+                detected.append((boxes, future))
+                crops.extend(crop_text_box(img, box) for box in boxes)
+
+            recognized = ocr_engine.recognize(crops, cls=self.use_angle_cls)
+        except Exception as e:
+            for img, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for boxes, future in detected:
+            future.set_result(build_ocr_result(boxes, recognized[offset:offset + len(boxes)]))
+            offset += len(boxes)
+
+
+ocr_batcher = OCRBatcher(
+    max_batch_size=int(os.environ.get('CLEARIFY_OCR_MAX_BATCH', 8)),
+    window_ms=float(os.environ.get('CLEARIFY_OCR_BATCH_WINDOW_MS', 20)),
+)
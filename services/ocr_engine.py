@@ -0,0 +1,236 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from services.model_registry import get_ocr
+
+
+# PaddleOCR drops recognized boxes below this score in its own ocr() pipeline
+DROP_SCORE = 0.5
+
+
+def detect_text(ocr, img):
+    """Runs only the text detector and returns the boxes (4 points each) in reading order."""
+    results = ocr.ocr(img, det=True, rec=False, cls=False)
+    boxes = results[0] if results else None
+    if not boxes:
+        return []
+    return sort_boxes(boxes)
+
+
+def recognize_crops(ocr, crops, cls=True):
+    """Runs the angle classifier and recognizer on a list of cropped text boxes.
+
+    PaddleOCR batches the crops internally, so one call covers any number of boxes,
+    even boxes coming from different images.
+    """
+    if not crops:
+        return []
+    results = ocr.ocr(crops, det=False, cls=cls)
+    return results[0] if results else []
+
+
+def classify_crops(ocr, crops):
+    """Runs only the angle classifier; returns the crops (upside-down ones rotated) and their labels.
+
+    The classifier rotates a crop only when its '180' score passes PaddleOCR's
+    `cls_thresh`. `ocr.ocr(det=False, rec=False)` would also run the recognizer.
+    """
+    crops, labels, _ = ocr.text_classifier(list(crops))
+    return crops, [label for label, _ in labels]
+
+
+def crop_text_box(img, box):
+    # Same perspective crop PaddleOCR applies between detection and recognition
+    points = np.array(box, dtype=np.float32)
+    width = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+    height = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+    width, height = max(width, 1), max(height, 1)
+    target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    matrix = cv2.getPerspectiveTransform(points, target)
+    crop = cv2.warpPerspective(img, matrix, (width, height),
+                               borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+    # Vertical text is rotated so the recognizer reads it left to right
+    if height / width >= 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+
+def sort_boxes(boxes):
+    """Sorts boxes top to bottom, then left to right within a row (as PaddleOCR does)."""
+    boxes = sorted(boxes, key=lambda box: (box[0][1], box[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+
+def build_ocr_result(boxes, recognized, drop_score=DROP_SCORE):
+    """Packs boxes and (text, score) pairs into the `ocr.ocr(img)` result layout."""
+    lines = [[box, (text, score)] for box, (text, score) in zip(boxes, recognized)
+             if score >= drop_score]
+    return [lines]
+
+
+def crop_key(crop, levels=8):
+    """Hash of a text crop after normalizing away most sensor noise.
+
+    The crop is scaled to 32 px high (width rounded to 8 px), blurred, stretched
+    to the full contrast range and quantized to `levels` grey levels, so frames
+    of the same sign under slightly different exposure usually share a key.
+    Pixels sitting on a level boundary can still flip, so this is a best-effort
+    match. The accepted risk: two crops that differ only below that resolution
+    (a thin stroke, '1' versus 'l' in small print) share a key and the second
+    one is read as the first.
+    """
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    height, width = gray.shape[:2]
+    target_width = min(max(round(width * 32 / max(height, 1) / 8) * 8, 8), 320)
+    small = cv2.resize(gray, (target_width, 32), interpolation=cv2.INTER_AREA)
+    small = cv2.GaussianBlur(small, (3, 3), 0)
+    small = cv2.normalize(small, None, 0, 255, cv2.NORM_MINMAX)
+    quantized = (small.astype(np.uint16) * levels // 256).astype(np.uint8)
+    digest = hashlib.blake2b(quantized.tobytes(), digest_size=16)
+    digest.update(str(quantized.shape).encode('ascii'))
+    return digest.hexdigest()
+
+
+# Orientation stability of one stream of frames (a live session): once the
+# angle classifier has found only upright text for `stable_after` calls in a
+# row, it is skipped for the next `skip_calls` calls of that stream. Owned by
+# the caller, so one session settling down never turns the classifier off for
+# uploads, jobs or other sessions.
+class OrientationState:
+    def __init__(self, stable_after=5, skip_calls=20):
+        self.stable_after = stable_after
+        self.skip_calls = skip_calls
+        self._upright_streak = 0
+        self._skip_remaining = 0
+
+    def should_classify(self):
+        if self._skip_remaining > 0:
+            self._skip_remaining -= 1
+            return False
+        return True
+
+    def record(self, labels):
+        if all(label == '0' for label in labels):
+            self._upright_streak += 1
+            if self._upright_streak >= self.stable_after:
+                self._skip_remaining = self.skip_calls
+                self._upright_streak = 0
+        else:
+            self._upright_streak = 0
+
+
+# Stage-split wrapper around PaddleOCR: the detector, the angle classifier and
+# the recognizer run separately. Recognized crops are cached by a quantized
+# hash of their pixels (see crop_key), so repeated signs and labels skip
+# recognition. Only crops that went through the angle classifier are cached,
+# so a misread upside-down crop never ends up in the cache. Live sessions may
+# pass an OrientationState to skip the classifier while their text stays upright.
+class OCREngine:
+    def __init__(self, cache_size=4096, stable_after=5, skip_calls=20):
+        self.cache_size = cache_size
+        self.stable_after = stable_after
+        self.skip_calls = skip_calls
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # The registry's PaddleOCR predictors are not thread-safe, and the batcher,
+        # the live worker, frame ingest, OCR jobs and tiled uploads all call through here
+        self._predictor_lock = threading.Lock()
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cls_runs = 0
+        self.cls_skipped = 0
+
+    def orientation_state(self):
+        """A new OrientationState for one live session, with the engine's settings."""
+        return OrientationState(self.stable_after, self.skip_calls)
+
+    def detect(self, img):
+        with self._predictor_lock:
+            return detect_text(get_ocr(), img)
+
+    def recognize(self, crops, cls=True, orientation=None):
+        """Returns (text, score) for each crop, serving repeated crops from the cache.
+
+        With `cls` the angle classifier runs first, unless `orientation` (the
+        caller's OrientationState) says the stream's text has been upright.
+        """
+        keys = [crop_key(crop) for crop in crops]
+        results = [None] * len(crops)
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    results[i] = cached
+                    self.cache_hits += 1
+                else:
+                    # Identical crops within one call are recognized once
+                    missing.setdefault(key, []).append(i)
+            self.cache_misses += len(missing)
+
+        if missing:
+            pending = [crops[positions[0]] for positions in missing.values()]
+            classified = cls and (orientation is None or orientation.should_classify())
+            if classified:
+                with self._predictor_lock:
+                    pending, labels = classify_crops(get_ocr(), pending)
+                if orientation is not None:
+                    orientation.record(labels)
+            with self._predictor_lock:
+                recognized = recognize_crops(get_ocr(), pending, cls=False)
+            with self._lock:
+                if classified:
+                    self.cls_runs += 1
+                elif cls:
+                    self.cls_skipped += 1
+                for (key, positions), result in zip(missing.items(), recognized):
+                    result = tuple(result)
+                    for i in positions:
+                        results[i] = result
+                    if classified:
+                        self._cache[key] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return results
+
+    def warmup(self, img):
+        """Runs the detector, the angle classifier and the recognizer once, bypassing the cache."""
+        with self._predictor_lock:
+            ocr = get_ocr()
+            detect_text(ocr, img)
+            crops, _ = classify_crops(ocr, [img])
+            recognize_crops(ocr, crops, cls=False)
+
+    def ocr(self, img, orientation=None):
+        """Full detect + recognize pass, returned in the `ocr.ocr(img, cls=True)` layout."""
+        boxes = self.detect(img)
+        crops = [crop_text_box(img, box) for box in boxes]
+        return build_ocr_result(boxes, self.recognize(crops, orientation=orientation))
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses,
+                'cache_hit_rate': round(self.cache_hits / lookups, 3) if lookups else 0.0,
+                'cache_size': len(self._cache),
+                'cls_runs': self.cls_runs,
+                'cls_skipped': self.cls_skipped,
+            }
+
+
+ocr_engine = OCREngine(cache_size=int(os.environ.get('CLEARIFY_OCR_CROP_CACHE', 4096)))
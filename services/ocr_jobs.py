@@ -0,0 +1,302 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from services import pdf_render
+from services.layout import analyze_layout
+from services.ocr_batcher import ocr_batcher
+from services.ocr_preprocess import preprocess_planner
+from services.ocr_tiling import tiled_ocr
+
+
+CACHE_DIR = os.environ.get('CLEARIFY_OCR_JOB_CACHE', 'ocr_cache')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def detect_kind(filename, data):
+    if data[:5] == b'%PDF-' or filename.lower().endswith('.pdf'):
+        return 'pdf'
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        return 'zip'
+    raise ValueError("Upload a PDF or a zip archive of images.")
+
+
+def natural_key(name):
+    """Sort key comparing the digit runs of a name as numbers: scan_2 comes before scan_10."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+
+def zip_image_names(data):
+    """Names of the image entries of a zip archive, in natural file name order (nothing is decompressed)."""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return sorted((name for name in archive.namelist()
+                       if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('__MACOSX/')),
+                      key=natural_key)
+
+
+def read_zip_image(data, name, max_bytes):
+    """Decompresses one zip entry, refusing entries larger than `max_bytes`."""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        if archive.getinfo(name).file_size > max_bytes:
+            raise ValueError(f"{name} is larger than {max_bytes // (1024 * 1024)} MB")
+        # The declared size can lie (zip bombs), so the read itself is capped too
+        with archive.open(name) as entry:
+            image = entry.read(max_bytes + 1)
+    if len(image) > max_bytes:
+        raise ValueError(f"{name} is larger than {max_bytes // (1024 * 1024)} MB")
+    return image
+
+
+def ocr_page(img):
+    """OCRs one page image and returns its OCRResult."""
+    ocr = tiled_ocr.ocr if tiled_ocr.should_tile(img) else ocr_batcher.ocr
+    results, _, _ = preprocess_planner.run(img, ocr)
+    return analyze_layout(results)
+
+
+class OCRJob:
+    def __init__(self, filename, content_hash):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.content_hash = content_hash
+        self.status = 'queued'
+        self.pages_total = 0
+        self.pages = {}
+        self.error = None
+        self.cached = False
+        self.created = time.time()
+        self.finished = None
+        # Bumped on every change, so watchers know when to send an update
+        self.version = 0
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed')
+
+    def progress(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'pages_done': len(self.pages),
+            'pages_total': self.pages_total,
+            'cached': self.cached,
+            'error': self.error,
+        }
+
+    def ordered_pages(self):
+        return [self.pages[index] for index in sorted(self.pages)]
+
+    def transcript(self):
+        return '\n\n'.join(page['text'] for page in self.ordered_pages() if page.get('text'))
+
+
+# Asynchronous OCR of multi-page uploads (PDFs and zip archives of images).
+# PDF pages are rendered in a process pool, pages are OCR'd on a small thread
+# pool (bounded parallelism, recognition still shares the OCR batcher). Each
+# OCR worker asks for its own page's render or zip entry, so at most
+# `ocr_concurrency` decoded pages are held in memory at a time; zip entries
+# above `max_image_mb` are refused. Watchers are woken as each
+# page finishes. Finished transcripts are cached on disk by the SHA-256 of
+# the upload, so the same file is never OCR'd twice.
+class OCRJobManager:
+    def __init__(self, ocr_concurrency=2, render_workers=2, max_pages=200, dpi=200, cache_dir=CACHE_DIR,
+                 max_jobs=100, max_image_mb=25):
+        self.ocr_concurrency = ocr_concurrency
+        self.render_workers = render_workers
+        self.max_pages = max_pages
+        self.max_image_bytes = int(max_image_mb * 1024 * 1024)
+        self.dpi = dpi
+        self.cache_dir = cache_dir
+        self.max_jobs = max_jobs
+        self._ocr_pool = ThreadPoolExecutor(max_workers=ocr_concurrency, thread_name_prefix='ocr-job')
+        self._render_pool = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+        self._submitted = 0
+        self._cache_hits = 0
+        self._pages_processed = 0
+        self._page_seconds = 0.0
+
+    def submit(self, filename, data):
+        """Starts a job for a PDF or zip upload; raises ValueError for other files."""
+        kind = detect_kind(filename, data)
+        job = OCRJob(filename, hashlib.sha256(data).hexdigest())
+        with self._lock:
+            self._submitted += 1
+            self._jobs[job.id] = job
+            self._expire_jobs()
+
+        cached = self._read_cache(job.content_hash)
+        if cached is not None:
+            with self._changed:
+                self._cache_hits += 1
+                job.pages = {index: page for index, page in enumerate(cached)}
+                job.pages_total = len(cached)
+                job.cached = True
+                self._finish_locked(job, 'done')
+            return job
+
+        threading.Thread(target=self._run, args=(job, kind, data), name='ocr-job', daemon=True).start()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def watch(self, job, keepalive=15.0):
+        """Yields ('page', page) for each finished page and ('progress', info) after
+        every change, until the job is done."""
+        version, sent = -1, set()
+        while True:
+            with self._changed:
+                if job.version == version:
+                    self._changed.wait_for(lambda: job.version != version, timeout=keepalive)
+                version = job.version
+                new_pages = [job.pages[index] for index in sorted(job.pages) if index not in sent]
+                sent.update(job.pages)
+                progress = job.progress()
+                done = job.done
+            for page in new_pages:
+                yield 'page', page
+            yield 'progress', progress
+            if done:
+                return
+
+    def _run(self, job, kind, data):
+        path = None
+        try:
+            if kind == 'pdf':
+                with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as handle:
+                    handle.write(data)
+                    path = handle.name
+                count = min(pdf_render.page_count(path), self.max_pages)
+                render_pool = self._get_render_pool()
+                loaders = [lambda index=index: render_pool.submit(pdf_render.render_page, path, index,
+                                                                   self.dpi).result()
+                           for index in range(count)]
+            else:
+                names = zip_image_names(data)[:self.max_pages]
+                if not names:
+                    raise ValueError("The zip archive contains no images.")
+                # Like PDF pages, each image is only decompressed by the worker that OCRs it
+                loaders = [lambda name=name: read_zip_image(data, name, self.max_image_bytes)
+                           for name in names]
+
+            with self._changed:
+                job.status = 'running'
+                job.pages_total = len(loaders)
+                job.version += 1
+                self._changed.notify_all()
+
+            futures = [self._ocr_pool.submit(self._process_page, job, index, load)
+                       for index, load in enumerate(loaders)]
+            for future in futures:
+                future.result()
+        except Exception as e:
+            print(f"OCR job {job.id} failed: {e}")
+            with self._changed:
+                job.error = str(e)
+                self._finish_locked(job, 'failed')
+            return
+        finally:
+            if path is not None:
+                os.remove(path)
+
+        with self._changed:
+            self._finish_locked(job, 'done')
+            pages = job.ordered_pages()
+        if not any('error' in page for page in pages):
+            self._write_cache(job.content_hash, pages)
+
+    def _process_page(self, job, index, load):
+        start = time.perf_counter()
+        try:
+            img = cv2.imdecode(np.frombuffer(load(), dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                raise ValueError("Could not decode the page image")
+            result = ocr_page(img)
+            page = {'page': index + 1, **result.to_dict(), 'text': result.filtered().text}
+        except Exception as e:
+            print(f"OCR job {job.id}: page {index + 1} failed: {e}")
+            page = {'page': index + 1, 'error': str(e)}
+        elapsed = time.perf_counter() - start
+
+        with self._changed:
+            job.pages[index] = page
+            job.version += 1
+            self._pages_processed += 1
+            self._page_seconds += elapsed
+            self._changed.notify_all()
+
+    def _finish_locked(self, job, status):
+        job.status = status
+        job.finished = time.time()
+        job.version += 1
+        self._changed.notify_all()
+
+    def _get_render_pool(self):
+        with self._lock:
+            if self._render_pool is None:
+                # Spawned, not forked: the parent process runs model threads. Spawned
+                # workers re-import the launching script, which is why main.py only
+                # imports the app (app.py) under __main__
+                self._render_pool = ProcessPoolExecutor(max_workers=self.render_workers,
+                                                        mp_context=multiprocessing.get_context('spawn'))
+            return self._render_pool
+
+    def _expire_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(len(self._jobs) - self.max_jobs, 0)]:
+            del self._jobs[job_id]
+
+    def _cache_path(self, content_hash):
+        return os.path.join(self.cache_dir, f'{content_hash}.json')
+
+    def _read_cache(self, content_hash):
+        try:
+            with open(self._cache_path(content_hash), encoding='utf-8') as handle:
+                return json.load(handle)['pages']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_cache(self, content_hash, pages):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(content_hash)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump({'pages': pages}, handle)
+        os.replace(tmp_path, path)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'jobs_submitted': self._submitted,
+                'jobs_running': sum(1 for job in self._jobs.values() if not job.done),
+                'cache_hits': self._cache_hits,
+                'pages_processed': self._pages_processed,
+                'mean_page_ms': round(self._page_seconds / self._pages_processed * 1000, 1)
+                if self._pages_processed else 0.0,
+            }
+
+
+ocr_jobs = OCRJobManager(
+    ocr_concurrency=int(os.environ.get('CLEARIFY_OCR_JOB_WORKERS', 2)),
+    render_workers=int(os.environ.get('CLEARIFY_PDF_RENDER_WORKERS', 2)),
+    max_pages=int(os.environ.get('CLEARIFY_OCR_JOB_MAX_PAGES', 200)),
+    max_image_mb=float(os.environ.get('CLEARIFY_OCR_JOB_MAX_IMAGE_MB', 25)),
+)
@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from services.frame_quality import downscale
+
+
+def image_stats(img):
+    """Cheap statistics used to choose a preprocessing transform (on a 320px copy)."""
+    small = downscale(img)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    brightness = float(gray.mean())
+    # Uneven lighting: how much the heavily blurred background varies across the image
+    background = cv2.GaussianBlur(gray, (0, 0), sigmaX=max(gray.shape) / 8)
+    return {
+        'brightness': brightness,
+        'contrast': float(gray.std()),
+        'unevenness': float(background.std()) / max(brightness, 1.0),
+        'sharpness': float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+    }
+
+
+def _to_gray(img):
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+
+def _to_color(gray):
+    # The recognizer expects 3-channel crops
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def identity(img):
+    return img
+
+
+def brighten(img):
+    # The fixed adjustment the upload page used before
+    return cv2.convertScaleAbs(img, alpha=1.2, beta=20)
+
+
+def gamma(img):
+    # Gamma chosen to move the mean brightness towards mid-gray
+    mean = max(float(_to_gray(img).mean()), 1.0) / 255
+    value = np.log(0.5) / np.log(mean)
+    table = np.clip(((np.arange(256) / 255) ** value) * 255, 0, 255).astype(np.uint8)
+    return cv2.LUT(img, table)
+
+
+def clahe(img):
+    if img.ndim == 2:
+        return _to_color(cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(img))
+    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+    lab[..., 0] = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(lab[..., 0])
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+
+def adaptive_threshold(img):
+    # Binarization per neighbourhood, for shadows and uneven lighting
+    blurred = cv2.GaussianBlur(_to_gray(img), (5, 5), 0)
+    return _to_color(cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                           cv2.THRESH_BINARY, 31, 10))
+
+
+def otsu(img):
+    blurred = cv2.GaussianBlur(_to_gray(img), (5, 5), 0)
+    _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return _to_color(binary)
+
+
+def sharpen(img):
+    # Unsharp mask for slightly soft frames
+    blurred = cv2.GaussianBlur(img, (0, 0), sigmaX=2.0)
+    return cv2.addWeighted(img, 1.5, blurred, -0.5, 0)
+
+
+VARIANTS = {
+    'none': identity,
+    'brighten': brighten,
+    'gamma': gamma,
+    'clahe': clahe,
+    'adaptive': adaptive_threshold,
+    'otsu': otsu,
+    'sharpen': sharpen,
+}
+
+
+def mean_confidence(results):
+    """Recognition confidence of an `ocr.ocr` result, weighted by text length."""
+    total, weight = 0.0, 0
+    for line in results or []:
+        for word_info in line or []:
+            text, score = word_info[1]
+            total += score * len(text)
+            weight += len(text)
+    return total / weight if weight else 0.0
+
+
+# Picks one preprocessing transform from cheap image statistics instead of
+# OCR'ing every variant. In cascade mode a second variant is tried only when
+# the first one's OCR confidence is below the threshold, and the better result
+# wins. Confidence and latency per variant are recorded for tuning.
+class PreprocessPlanner:
+    def __init__(self, cascade=False, cascade_threshold=0.8, dark=70, bright=190, low_contrast=35,
+                 uneven=0.25, soft=100.0):
+        self.cascade = cascade
+        self.cascade_threshold = cascade_threshold
+        self.dark = dark
+        self.bright = bright
+        self.low_contrast = low_contrast
+        self.uneven = uneven
+        self.soft = soft
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'runs': 0, 'chosen': 0, 'confidence': 0.0,
+                                           'preprocess_seconds': 0.0, 'ocr_seconds': 0.0})
+        self._cascades = 0
+
+    def plan(self, img):
+        """Returns variant names, best first, for this image."""
+        stats = image_stats(img)
+        plan = []
+        if stats['brightness'] < self.dark or stats['brightness'] > self.bright:
+            plan.append('gamma')
+        if stats['unevenness'] > self.uneven:
+            plan.append('adaptive')
+        if stats['contrast'] < self.low_contrast:
+            plan.append('clahe')
+        if stats['sharpness'] < self.soft:
+            plan.append('sharpen')
+        # Well-exposed images mostly need nothing; the old fixed adjustment is the fallback
+        plan += [name for name in ('none', 'brighten') if name not in plan]
+        return plan
+
+    def run(self, img, ocr, cascade=None):
+        """OCRs `img` with the planned transform; returns (results, processed_img, variant).
+
+        `ocr` is any callable returning the `ocr.ocr(img)` layout.
+        """
+        cascade = self.cascade if cascade is None else cascade
+        plan = self.plan(img)
+        best = None
+        for name in plan[:2 if cascade else 1]:
+            start = time.perf_counter()
+            processed = VARIANTS[name](img)
+            preprocessed = time.perf_counter()
+            results = ocr(processed)
+            finished = time.perf_counter()
+            confidence = mean_confidence(results)
+            self._record(name, confidence, preprocessed - start, finished - preprocessed)
+            print(f"OCR preprocess '{name}': confidence {confidence:.3f}, "
+                  f"preprocess {(preprocessed - start) * 1000:.1f} ms, ocr {(finished - preprocessed) * 1000:.1f} ms")
+
+            if best is None or confidence > best[0]:
+                best = (confidence, results, processed, name)
+            if confidence >= self.cascade_threshold:
+                break
+            if cascade and name == plan[0]:
+                with self._lock:
+                    self._cascades += 1
+
+        confidence, results, processed, name = best
+        with self._lock:
+            self._stats[name]['chosen'] += 1
+        return results, processed, name
+
+    def _record(self, name, confidence, preprocess_seconds, ocr_seconds):
+        with self._lock:
+            stats = self._stats[name]
+            stats['runs'] += 1
+            stats['confidence'] += confidence
+            stats['preprocess_seconds'] += preprocess_seconds
+            stats['ocr_seconds'] += ocr_seconds
+
+    def metrics(self):
+        with self._lock:
+            variants = {}
+            for name, stats in self._stats.items():
+                runs = stats['runs'] or 1
+                variants[name] = {
+                    'runs': stats['runs'],
+                    'chosen': stats['chosen'],
+                    'mean_confidence': round(stats['confidence'] / runs, 3),
+                    'mean_preprocess_ms': round(stats['preprocess_seconds'] / runs * 1000, 1),
+                    'mean_ocr_ms': round(stats['ocr_seconds'] / runs * 1000, 1),
+                }
+            return {'cascade': self.cascade, 'cascades': self._cascades, 'variants': variants}
+
+
+preprocess_planner = PreprocessPlanner(
+    cascade=os.environ.get('CLEARIFY_OCR_CASCADE', '0').lower() in ('1', 'true', 'yes'),
+    cascade_threshold=float(os.environ.get('CLEARIFY_OCR_CASCADE_THRESHOLD', 0.8)),
+)
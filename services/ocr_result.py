@@ -0,0 +1,125 @@
+import os
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+
+# Words below this confidence are treated as noise: dropped before spell
+# correction and speech
+MIN_CONFIDENCE = float(os.environ.get('CLEARIFY_OCR_MIN_CONFIDENCE', 0.6))
+# Words below this confidence are kept but flagged so the UI can highlight them
+DOUBTFUL_CONFIDENCE = float(os.environ.get('CLEARIFY_OCR_DOUBTFUL_CONFIDENCE', 0.85))
+
+
+def weighted_confidence(items):
+    """Mean confidence of (text, confidence) pairs, weighted by text length."""
+    weight = sum(len(text) for text, _ in items)
+    return round(sum(confidence * len(text) for text, confidence in items) / weight, 4) if weight else 0.0
+
+
+def union_box(boxes):
+    boxes = list(boxes)
+    return [min(box[0] for box in boxes), min(box[1] for box in boxes),
+            max(box[2] for box in boxes), max(box[3] for box in boxes)]
+
+
+@dataclass
+class OCRWord:
+    text: str
+    box: List[float]
+    confidence: float
+
+
+@dataclass
+class OCRLine:
+    text: str
+    box: List[float]
+    confidence: float
+    words: List[OCRWord] = field(default_factory=list)
+
+    @classmethod
+    def from_words(cls, words):
+        return cls(
+            text=' '.join(word.text for word in words),
+            box=union_box(word.box for word in words),
+            confidence=weighted_confidence([(word.text, word.confidence) for word in words]),
+            words=list(words),
+        )
+
+    def filtered(self, min_confidence) -> Optional['OCRLine']:
+        words = [word for word in self.words if word.confidence >= min_confidence]
+        if len(words) == len(self.words):
+            return self
+        return OCRLine.from_words(words) if words else None
+
+
+@dataclass
+class OCRBlock:
+    id: int
+    column: int
+    text: str
+    box: List[float]
+    confidence: float
+    lines: List[OCRLine] = field(default_factory=list)
+
+    @classmethod
+    def from_lines(cls, block_id, column, lines):
+        return cls(
+            id=block_id,
+            column=column,
+            text=' '.join(line.text for line in lines),
+            box=union_box(line.box for line in lines),
+            confidence=weighted_confidence([(line.text, line.confidence) for line in lines]),
+            lines=list(lines),
+        )
+
+    def filtered(self, min_confidence) -> Optional['OCRBlock']:
+        lines = [line for line in (line.filtered(min_confidence) for line in self.lines) if line is not None]
+        if lines == self.lines:
+            return self
+        return OCRBlock.from_lines(self.id, self.column, lines) if lines else None
+
+
+@dataclass
+class OCRResult:
+    """OCR output in reading order: blocks -> lines -> words, each with a box and confidence.
+
+    PaddleOCR scores whole detected lines, so every word of a detected line
+    carries that line's score.
+    """
+    blocks: List[OCRBlock] = field(default_factory=list)
+
+    @property
+    def text(self):
+        return '\n'.join(block.text for block in self.blocks)
+
+    @property
+    def confidence(self):
+        return weighted_confidence([(block.text, block.confidence) for block in self.blocks])
+
+    def lines(self):
+        return [line for block in self.blocks for line in block.lines]
+
+    def words(self):
+        return [word for line in self.lines() for word in line.words]
+
+    def filtered(self, min_confidence=MIN_CONFIDENCE):
+        """Copy without the words below `min_confidence` (and lines/blocks left empty)."""
+        blocks = [block.filtered(min_confidence) for block in self.blocks]
+        return OCRResult([block for block in blocks if block is not None])
+
+    def select(self, block_ids=None):
+        """Copy with only the given blocks (all of them when `block_ids` is None)."""
+        if block_ids is None:
+            return self
+        wanted = set(block_ids)
+        return OCRResult([block for block in self.blocks if block.id in wanted])
+
+    def to_dict(self, doubtful_confidence=DOUBTFUL_CONFIDENCE):
+        return {
+            'text': self.text,
+            'confidence': self.confidence,
+            'blocks': [asdict(block) for block in self.blocks],
+            # Flat word list for highlighting doubtful words in the UI
+            'words': [{'text': word.text, 'confidence': word.confidence,
+                       'doubtful': word.confidence < doubtful_confidence} for word in self.words()],
+        }
@@ -0,0 +1,159 @@
+import copy
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.model_registry import get_ocr, registry
+from services.ocr_engine import ocr_engine, crop_text_box, sort_boxes, build_ocr_result
+
+
+def tile_grid(height, width, tile_size, overlap):
+    """Returns (x, y, w, h) tiles covering the image, neighbours overlapping by `overlap`."""
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        step = tile_size - overlap
+        positions = list(range(0, length - tile_size, step))
+        return positions + [length - tile_size]
+
+    return [(x, y, min(tile_size, width), min(tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+
+def _rect(box):
+    points = np.asarray(box, dtype=np.float32)
+    return (*points.min(axis=0), *points.max(axis=0))
+
+
+def _area(rect):
+    return max(rect[2] - rect[0], 0) * max(rect[3] - rect[1], 0)
+
+
+def merge_boxes(boxes, containment=0.5, line_overlap=0.6):
+    """Merges duplicate and seam-split boxes from overlapping tiles.
+
+    Greedy NMS from the largest box down: a box that is mostly inside a kept box
+    is dropped, and a box on the same text line that overlaps a kept box (a line
+    cut by a tile seam) is merged into it.
+    """
+    boxes = sorted(boxes, key=lambda box: _area(_rect(box)), reverse=True)
+    kept = []  # [rect, box, merged]
+    for box in boxes:
+        rect = _rect(box)
+        for entry in kept:
+            other = entry[0]
+            ix = min(rect[2], other[2]) - max(rect[0], other[0])
+            iy = min(rect[3], other[3]) - max(rect[1], other[1])
+            if ix <= 0 or iy <= 0:
+                continue
+            if ix * iy >= containment * _area(rect):
+                break
+            same_line = iy >= line_overlap * min(rect[3] - rect[1], other[3] - other[1])
+            if same_line:
+                entry[0] = (min(rect[0], other[0]), min(rect[1], other[1]),
+                            max(rect[2], other[2]), max(rect[3], other[3]))
+                entry[2] = True
+                break
+        else:
+            kept.append([rect, box, False])
+
+    merged = []
+    for rect, box, was_merged in kept:
+        if was_merged:
+            x1, y1, x2, y2 = (float(value) for value in rect)
+            box = [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+        merged.append(box)
+    return merged
+
+
+def _load_detector(cpu_threads):
+    # Only the text detection predictor (same class and settings as the shared
+    # PaddleOCR instance's): no second copy of the classifier and recognizer weights
+    ocr = get_ocr()
+    args = copy.copy(ocr.args)
+    args.cpu_threads = cpu_threads
+    return type(ocr.text_detector)(args)
+
+
+# OCR for large photos: the image is split into overlapping tiles no larger
+# than the detector's input size, so small text is not lost to downsampling.
+# Tiles are detected in parallel, each worker with its own detection predictor
+# (Paddle predictors are not safe to share across threads), registered in the
+# model registry as ocr_tile_detector_<n> so they show up in /models and
+# /metrics. Boxes are mapped back to the full image, merged across seams, and
+# recognized once through the shared engine, in reading order.
+class TiledOCR:
+    def __init__(self, tile_size=960, overlap=96, max_workers=2):
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr-tile')
+        # Registry names of the per-worker detectors; each is loaded on first use
+        self._detectors = queue.LifoQueue()
+        cpu_threads = max((os.cpu_count() or 2) // max_workers, 1)
+        for index in range(max_workers):
+            name = f'ocr_tile_detector_{index}'
+            registry.register(name, lambda: _load_detector(cpu_threads))
+            self._detectors.put(name)
+        self._lock = threading.Lock()
+
+        self._images = 0
+        self._tiles = 0
+        self._boxes_merged = 0
+        self._busy_seconds = 0.0
+
+    def should_tile(self, img):
+        return max(img.shape[:2]) > self.tile_size
+
+    def _detect_tile(self, img, tile):
+        x, y, w, h = tile
+        name = self._detectors.get()
+        try:
+            boxes, _ = registry.get(name)(np.ascontiguousarray(img[y:y + h, x:x + w]))
+        finally:
+            self._detectors.put(name)
+        if boxes is None:
+            return []
+        return [[[float(point[0]) + x, float(point[1]) + y] for point in box] for box in boxes]
+
+    def ocr(self, img):
+        """Tiled detect + recognize, returned in the `ocr.ocr(img)` result layout."""
+        if not self.should_tile(img):
+            return ocr_engine.ocr(img)
+
+        start = time.perf_counter()
+        tiles = tile_grid(img.shape[0], img.shape[1], self.tile_size, self.overlap)
+        detected = [box for boxes in self._executor.map(lambda tile: self._detect_tile(img, tile), tiles)
+                    for box in boxes]
+        boxes = sort_boxes(merge_boxes(detected))
+        recognized = ocr_engine.recognize([crop_text_box(img, box) for box in boxes])
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._images += 1
+            self._tiles += len(tiles)
+            self._boxes_merged += len(detected) - len(boxes)
+            self._busy_seconds += elapsed
+        return build_ocr_result(boxes, recognized)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'tile_size': self.tile_size,
+                'workers': self.max_workers,
+                'images': self._images,
+                'tiles': self._tiles,
+                'boxes_merged': self._boxes_merged,
+                'mean_image_ms': round(self._busy_seconds / self._images * 1000, 1) if self._images else 0.0,
+            }
+
+
+tiled_ocr = TiledOCR(
+    tile_size=int(os.environ.get('CLEARIFY_OCR_TILE_SIZE', 960)),
+    overlap=int(os.environ.get('CLEARIFY_OCR_TILE_OVERLAP', 96)),
+    max_workers=int(os.environ.get('CLEARIFY_OCR_TILE_WORKERS', 2)),
+)
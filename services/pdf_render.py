@@ -0,0 +1,30 @@
+import math
+import os
+
+import fitz  # PyMuPDF, installed with paddleocr
+
+
+# Kept in its own small module: it runs in spawned worker processes, which
+# import only this file and PyMuPDF instead of the whole OCR stack.
+
+# Oversized pages (posters, drawings) are rendered at a lower resolution so
+# one page never decodes to more than this many pixels
+MAX_PAGE_PIXELS = int(os.environ.get('CLEARIFY_PDF_MAX_PIXELS', 36_000_000))
+
+def page_count(path):
+    with fitz.open(path) as document:
+        return document.page_count
+
+
+def render_page(path, index, dpi=200, max_pixels=MAX_PAGE_PIXELS):
+    """Renders one PDF page and returns it as PNG bytes, scaled down to at most `max_pixels`."""
+    with fitz.open(path) as document:
+        page = document.load_page(index)
+        width, height = page.rect.width, page.rect.height
+        scale = dpi / 72
+        if (width * scale + 1) * (height * scale + 1) > max_pixels:
+            # Largest scale whose pixmap, rounded up to whole pixels, stays within the cap
+            area, perimeter = width * height, width + height
+            scale = (math.sqrt(perimeter ** 2 + 4 * area * (max_pixels - 1)) - perimeter) / (2 * area)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        return pixmap.tobytes('png')
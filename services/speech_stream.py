@@ -0,0 +1,124 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from services.tts import get_engine, stream_speech, synthesize_speech
+
+
+# Streams a transcript to the browser sentence by sentence: sentences are
+# synthesized in a pipeline and each MP3 segment is written to the chunked
+# response as soon as it is ready, so playback starts after the first one.
+# MP3 frames are self-contained, so the concatenated segments play as one file.
+# If the first sentence fails, the offline engine speaks the whole text as one
+# WAV file instead; once MP3 bytes have been sent the engine is pinned, and a
+# later failure ends the stream rather than splicing WAV into MP3.
+class SpeechStreamer:
+    def __init__(self, max_pending=256, window=200):
+        self.max_pending = max_pending
+        self._pending = OrderedDict()  # token -> (text, lang)
+        self._lock = threading.Lock()
+        self._first_audio_seconds = deque(maxlen=window)
+        self._total_seconds = deque(maxlen=window)
+        self._streams = 0
+
+    def register(self, text, lang='en'):
+        """Stores text to be spoken and returns the token for its stream URL."""
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._pending[token] = (text, lang)
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+        return token
+
+    def get(self, token):
+        with self._lock:
+            return self._pending.get(token)
+
+    def stream(self, text, lang='en'):
+        """Returns (chunk generator, mimetype) for the given text.
+
+        The first MP3 sentence is synthesized before the mimetype is chosen, so
+        an online engine that fails right away (e.g. no network) falls back to
+        the offline engine's WAV for the whole text.
+        """
+        engine = get_engine()
+        if engine.ext == 'mp3':
+            start = time.perf_counter()
+            sentences = stream_speech(text, lang, engine)
+            try:
+                first = next(sentences, None)
+            except Exception as e:
+                sentences.close()
+                print(f"TTS engine '{engine.name}' failed, falling back to offline engine: {e}")
+                engine = get_engine('pyttsx3')
+            else:
+                return self._sentence_chunks(sentences, first, engine, start), engine.mimetype
+        # WAV files cannot simply be concatenated: send the whole file in one piece
+        return self._file_chunks(text, lang, engine), engine.mimetype
+
+    def _sentence_chunks(self, sentences, first, engine, start):
+        try:
+            if first is None:
+                return
+            _, path = first
+            with open(path, 'rb') as f:
+                data = f.read()
+            self._record_first_audio(time.perf_counter() - start)
+            yield data
+            try:
+                for _, path in sentences:
+                    with open(path, 'rb') as f:
+                        yield f.read()
+            except Exception as e:
+                # MP3 bytes have already been sent, so WAV cannot be spliced in
+                print(f"TTS engine '{engine.name}' failed mid-stream, ending the stream: {e}")
+                return
+            self._record_total(time.perf_counter() - start)
+        finally:
+            sentences.close()
+
+    def _file_chunks(self, text, lang, engine, chunk_size=64 * 1024):
+        # Time to first audio includes synthesizing the whole file
+        start = time.perf_counter()
+        path = synthesize_speech(text, lang, engine)
+        with open(path, 'rb') as f:
+            self._record_first_audio(time.perf_counter() - start)
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                yield data
+        self._record_total(time.perf_counter() - start)
+
+    def _record_first_audio(self, seconds):
+        with self._lock:
+            self._streams += 1
+            self._first_audio_seconds.append(seconds)
+
+    def _record_total(self, seconds):
+        with self._lock:
+            self._total_seconds.append(seconds)
+
+    @staticmethod
+    def _summary(samples):
+        if not samples:
+            return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0}
+        ordered = sorted(samples)
+        return {
+            'mean': round(sum(ordered) / len(ordered), 3),
+            'p50': round(ordered[len(ordered) // 2], 3),
+            'p95': round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 3),
+        }
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'streams': self._streams,
+                'pending': len(self._pending),
+                'time_to_first_audio_seconds': self._summary(self._first_audio_seconds),
+                'total_seconds': self._summary(self._total_seconds),
+            }
+
+
+speech_streamer = SpeechStreamer()
@@ -0,0 +1,123 @@
+"""Precompiled SymSpell dictionary snapshot.
+
+Building SymSpell means parsing the 82k-line frequency dictionary and
+generating the deletes index, which is a noticeable part of worker startup.
+The fully built structures are serialized once into a compact binary
+snapshot; at startup the snapshot is loaded instead and only rebuilt when it
+no longer matches the source dictionary or the SymSpell parameters.
+
+Snapshot layout: MAGIC | uint32 header length | JSON header | zlib payload.
+The header records the source dictionary checksum, the parameters and the
+payload checksum.
+
+Build step (optional, the app builds the snapshot on first start anyway):
+    python -m services.symspell_snapshot
+"""
+import hashlib
+import json
+import os
+import struct
+import zlib
+
+MAGIC = b'CLRSYM01'
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+SNAPSHOT_PATH = os.path.join(os.environ.get('CLEARIFY_MODEL_CACHE', 'model_cache'), 'symspell.snapshot')
+
+
+def dictionary_path():
+    import pkg_resources
+    return pkg_resources.resource_filename("symspellpy", "frequency_dictionary_en_82_765.txt")
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _expected_header(source_path):
+    import symspellpy
+    return {
+        'source_sha256': _file_sha256(source_path),
+        'max_edit_distance': MAX_EDIT_DISTANCE,
+        'prefix_length': PREFIX_LENGTH,
+        'symspellpy': getattr(symspellpy, '__version__', 'unknown'),
+    }
+
+
+def build_sym_spell(source_path=None):
+    from symspellpy import SymSpell
+    sym_spell = SymSpell(max_dictionary_edit_distance=MAX_EDIT_DISTANCE, prefix_length=PREFIX_LENGTH)
+    sym_spell.load_dictionary(source_path or dictionary_path(), term_index=0, count_index=1)
+    return sym_spell
+
+
+def write_snapshot(sym_spell, source_path=None, path=SNAPSHOT_PATH):
+    header = _expected_header(source_path or dictionary_path())
+    payload = zlib.compress(sym_spell.save_pickle(to_bytes=True), 6)
+    header['payload_sha256'] = hashlib.sha256(payload).hexdigest()
+    header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(source_path=None, path=SNAPSHOT_PATH):
+    """Returns the SymSpell instance stored in the snapshot, or None if it is missing, stale or corrupt."""
+    from symspellpy import SymSpell
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        (header_length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+        payload = f.read()
+
+    expected = _expected_header(source_path or dictionary_path())
+    if any(header.get(key) != value for key, value in expected.items()):
+        return None
+    if hashlib.sha256(payload).hexdigest() != header.get('payload_sha256'):
+        return None
+
+    sym_spell = SymSpell(max_dictionary_edit_distance=MAX_EDIT_DISTANCE, prefix_length=PREFIX_LENGTH)
+    if not sym_spell.load_pickle(zlib.decompress(payload), from_bytes=True):
+        return None
+    return sym_spell
+
+
+def load_sym_spell(path=SNAPSHOT_PATH):
+    """Loads SymSpell from the snapshot, rebuilding (and rewriting) it only when stale."""
+    source_path = dictionary_path()
+    try:
+        sym_spell = read_snapshot(source_path, path)
+    except (OSError, ValueError, zlib.error) as e:
+        print(f"Ignoring unreadable SymSpell snapshot {path}: {e}")
+        sym_spell = None
+    if sym_spell is not None:
+        return sym_spell
+
+    print("SymSpell snapshot missing or stale, rebuilding from the frequency dictionary")
+    sym_spell = build_sym_spell(source_path)
+    try:
+        write_snapshot(sym_spell, source_path, path)
+    except OSError as e:
+        print(f"Could not write SymSpell snapshot {path}: {e}")
+    return sym_spell
+
+
+if __name__ == '__main__':
+    import time
+    start = time.perf_counter()
+    write_snapshot(build_sym_spell())
+    print(f"Wrote {SNAPSHOT_PATH} ({os.path.getsize(SNAPSHOT_PATH) / 1024 / 1024:.1f} MB) "
+          f"in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,156 @@
+import difflib
+import itertools
+
+import cv2
+import numpy as np
+
+from services.layout import layout_lines
+from services.ocr_engine import crop_text_box
+from services.ocr_result import MIN_CONFIDENCE
+
+
+def bounding_rect(box):
+    points = np.asarray(box, dtype=np.float32)
+    x1, y1 = points.min(axis=0)
+    x2, y2 = points.max(axis=0)
+    return float(x1), float(y1), float(x2), float(y2)
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    intersection = max(x2 - x1, 0) * max(y2 - y1, 0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def crop_signature(crop):
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    return cv2.resize(gray, (48, 16), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+class TextRegion:
+    _ids = itertools.count(1)
+
+    def __init__(self, box):
+        self.id = next(self._ids)
+        self.box = box
+        self.rect = bounding_rect(box)
+        self.text = ""
+        self.score = 0.0
+        self.signature = None
+        self.missed = 0
+        self.spoken = False
+
+
+# Tracks text boxes across live frames: boxes are matched to the previous
+# frame's regions by IoU, and recognition only runs on regions that are new
+# or whose pixels changed. Between detections the known boxes are reused, so
+# the detector is skipped while the page holds still. Only lines that were
+# not read before are reported for speech.
+class TextRegionTracker:
+    def __init__(self, iou_threshold=0.4, change_threshold=12.0, detect_every=5, max_missed=2,
+                 similarity_threshold=0.85, min_confidence=MIN_CONFIDENCE):
+        self.iou_threshold = iou_threshold
+        self.change_threshold = change_threshold
+        self.detect_every = detect_every
+        self.max_missed = max_missed
+        self.similarity_threshold = similarity_threshold
+        self.min_confidence = min_confidence
+
+        self.regions = []
+        self._spoken = []
+        self._updates_since_detect = 0
+        # Angle classifier skipping follows this session's frames only
+        self.orientation = None
+        self.detections = 0
+        self.recognitions = 0
+        self.reused = 0
+
+    def update(self, frame, engine, redetect=False):
+        """Processes one frame; returns the lines that appeared since the last update."""
+        if redetect or not self.regions or self._updates_since_detect >= self.detect_every:
+            self._associate(engine.detect(frame))
+            self._updates_since_detect = 0
+            self.detections += 1
+        else:
+            self._updates_since_detect += 1
+
+        pending = []
+        for region in self.regions:
+            crop = crop_text_box(frame, region.box)
+            signature = crop_signature(crop)
+            if region.signature is not None and \
+                    float(np.mean(np.abs(signature - region.signature))) <= self.change_threshold:
+                self.reused += 1
+                continue
+            region.signature = signature
+            pending.append((region, crop))
+
+        if self.orientation is None:
+            self.orientation = engine.orientation_state()
+        recognized = engine.recognize([crop for _, crop in pending], orientation=self.orientation)
+        self.recognitions += len(pending)
+        for (region, _), (text, score) in zip(pending, recognized):
+            if score < self.min_confidence:
+                continue
+            if text != region.text:
+                region.text, region.score = text, score
+                region.spoken = False
+
+        return self._new_lines()
+
+    def _associate(self, boxes):
+        unmatched = list(self.regions)
+        matched = []
+        for box in boxes:
+            rect = bounding_rect(box)
+            best, best_iou = None, self.iou_threshold
+            for region in unmatched:
+                overlap = iou(rect, region.rect)
+                if overlap >= best_iou:
+                    best, best_iou = region, overlap
+            if best is None:
+                matched.append(TextRegion(box))
+                continue
+            unmatched.remove(best)
+            best.box, best.rect, best.missed = box, rect, 0
+            matched.append(best)
+
+        # A region survives a few missed detections before it is dropped
+        for region in unmatched:
+            region.missed += 1
+            if region.missed <= self.max_missed:
+                matched.append(region)
+        self.regions = sorted(matched, key=lambda region: (region.rect[1], region.rect[0]))
+
+    def _already_spoken(self, text):
+        key = text.lower()
+        return any(difflib.SequenceMatcher(None, key, spoken).ratio() >= self.similarity_threshold
+                   for spoken in self._spoken)
+
+    def _new_lines(self):
+        lines = []
+        for region in self.regions:
+            if region.spoken or not region.text:
+                continue
+            region.spoken = True
+            if self._already_spoken(region.text):
+                continue
+            lines.append(region.text)
+            self._spoken.append(region.text.lower())
+        # Keep the fuzzy-dedup window bounded
+        del self._spoken[:-200]
+        return lines
+
+    def transcript(self):
+        """Current text of every tracked region, in reading order."""
+        return layout_lines([[[region.box, (region.text, region.score)] for region in self.regions if region.text]])
+
+    def metrics(self):
+        return {
+            'regions': len(self.regions),
+            'detections': self.detections,
+            'recognitions': self.recognitions,
+            'recognitions_skipped': self.reused,
+        }
@@ -0,0 +1,122 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from services.tts_cache import tts_cache, normalize_text
+
+
+class TTSEngine:
+    """Renders text to an audio file. Subclasses set `name`, `ext` and `mimetype`."""
+    name = None
+    ext = None
+    mimetype = None
+    offline = False
+
+    def render(self, text, lang, path):
+        raise NotImplementedError
+
+
+class GTTSEngine(TTSEngine):
+    name = 'gtts'
+    ext = 'mp3'
+    mimetype = 'audio/mpeg'
+
+    def render(self, text, lang, path):
+        from gtts import gTTS
+        gTTS(text=text, lang=lang).save(path)
+
+
+class Pyttsx3Engine(TTSEngine):
+    # Local speech synthesis (SAPI5 / espeak / NSSpeechSynthesizer), no network needed
+    name = 'pyttsx3'
+    ext = 'wav'
+    mimetype = 'audio/wav'
+    offline = True
+
+    def __init__(self, rate=150):
+        self.rate = rate
+        self._engine = None
+        # pyttsx3 drives a single event loop, so renders are serialized
+        self._lock = threading.Lock()
+
+    def render(self, text, lang, path):
+        with self._lock:
+            if self._engine is None:
+                import pyttsx3
+                self._engine = pyttsx3.init()
+                self._engine.setProperty('rate', self.rate)
+            self._engine.save_to_file(text, path)
+            self._engine.runAndWait()
+
+
+ENGINES = {
+    'gtts': GTTSEngine,
+    'pyttsx3': Pyttsx3Engine,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name=None):
+    name = name or os.environ.get('CLEARIFY_TTS_ENGINE', 'gtts')
+    with _engines_lock:
+        if name not in _engines:
+            _engines[name] = ENGINES[name]()
+        return _engines[name]
+
+
+def split_sentences(text, max_chars=200):
+    """Splits text into sentences, breaking overly long ones at word boundaries."""
+    sentences = []
+    for sentence in re.split(r'(?<=[.!?;:])\s+', normalize_text(text)):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            sentences.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def synthesize_speech(text, lang='en', engine=None, fallback=True):
+    """Returns the path of an audio file speaking `text`, reusing a cached file when possible.
+
+    If an online engine fails (e.g. no network) the offline engine is used
+    instead, unless `fallback` is False.
+    """
+    engine = engine or get_engine()
+    try:
+        return tts_cache.get_or_create(text, lang, engine.name, engine.render, ext=engine.ext)
+    except Exception as e:
+        if engine.offline or not fallback:
+            raise
+        print(f"TTS engine '{engine.name}' failed, falling back to offline engine: {e}")
+        fallback = get_engine('pyttsx3')
+        return tts_cache.get_or_create(text, lang, fallback.name, fallback.render, ext=fallback.ext)
+
+
+_stream_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('CLEARIFY_TTS_WORKERS', 2)),
+                                      thread_name_prefix='tts')
+
+
+def stream_speech(text, lang='en', engine=None):
+    """Yields (sentence, audio_path) in order, each as soon as it is rendered.
+
+    All sentences are queued up front, so later ones render while the caller
+    is already handling (e.g. playing or sending) the first. Every sentence is
+    rendered by the same engine: a failure is raised rather than falling back,
+    since segments of different formats cannot be joined into one stream.
+    """
+    engine = engine or get_engine()
+    futures = [(sentence, _stream_executor.submit(synthesize_speech, sentence, lang, engine, False))
+               for sentence in split_sentences(text)]
+    try:
+        for sentence, future in futures:
+            yield sentence, future.result()
+    finally:
+        for _, future in futures:
+            future.cancel()
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+import unicodedata
+import uuid
+from collections import OrderedDict
+
+
+AUDIO_FOLDER = 'static/audio'
+CACHE_PREFIX = 'tts_'
+
+
+def normalize_text(text):
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+# Content-addressed cache of synthesized speech: the file name is a hash of
+# (normalized text, language, engine), so a repeated phrase is served from
+# disk instead of being synthesized again. Least recently used files are
+# evicted once the cache grows past its size or file-count limit.
+class TTSCache:
+    def __init__(self, folder=AUDIO_FOLDER, max_bytes=200 * 1024 * 1024, max_files=2000):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._entries = OrderedDict()  # key -> file size, oldest first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(folder, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        found = []
+        for filename in os.listdir(self.folder):
+            if not filename.startswith(CACHE_PREFIX) or filename.endswith('.tmp'):
+                continue
+            path = os.path.join(self.folder, filename)
+            stat = os.stat(path)
+            found.append((stat.st_mtime, filename, stat.st_size))
+        for _, filename, size in sorted(found):
+            self._entries[filename] = size
+            self._total_bytes += size
+
+    @staticmethod
+    def key(text, lang, engine, ext='mp3'):
+        digest = hashlib.sha256(f'{engine}\0{lang}\0{normalize_text(text)}'.encode('utf-8')).hexdigest()
+        return f'{CACHE_PREFIX}{engine}_{digest[:32]}.{ext}'
+
+    def get_or_create(self, text, lang, engine, synthesize, ext='mp3'):
+        """Returns the path of the cached audio, calling `synthesize(text, lang, path)` on a miss."""
+        filename = self.key(text, lang, engine, ext)
+        path = os.path.join(self.folder, filename)
+
+        if self._touch(filename, path):
+            return path
+
+        # One synthesis per key: concurrent requests for the same phrase wait for the first
+        with self._lock:
+            key_lock = self._key_locks.setdefault(filename, threading.Lock())
+        with key_lock:
+            if self._touch(filename, path):
+                return path
+
+            with self._lock:
+                self.misses += 1
+            tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+            try:
+                synthesize(normalize_text(text), lang, tmp_path)
+                # Atomic rename: readers never see a half-written file
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            with self._lock:
+                size = os.path.getsize(path)
+                self._entries[filename] = size
+                self._total_bytes += size
+                self._evict(keep=filename)
+                self._key_locks.pop(filename, None)
+        return path
+
+    def _touch(self, filename, path):
+        with self._lock:
+            if filename in self._entries and os.path.exists(path):
+                self._entries.move_to_end(filename)
+                self.hits += 1
+                return True
+            if filename in self._entries:
+                # Deleted behind our back
+                self._total_bytes -= self._entries.pop(filename)
+            return False
+
+    def _evict(self, keep):
+        while (self._total_bytes > self.max_bytes or len(self._entries) > self.max_files) \
+                and len(self._entries) > 1:
+            filename, size = next(iter(self._entries.items()))
+            if filename == keep:
+                break
+            del self._entries[filename]
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.folder, filename))
+            except OSError:
+                pass
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'files': len(self._entries),
+                'bytes': self._total_bytes,
+            }
+
+
+tts_cache = TTSCache(
+    max_bytes=int(float(os.environ.get('CLEARIFY_TTS_CACHE_MAX_MB', 200)) * 1024 * 1024),
+    max_files=int(os.environ.get('CLEARIFY_TTS_CACHE_MAX_FILES', 2000)),
+)
@@ -0,0 +1,161 @@
+// frame_capture.js
+// Grabs webcam frames in the browser (getUserMedia) and posts them as JPEG to
+// /api/frames/<mode>. The server answers right away and processes the frame
+// in the background; results are polled from /api/frames/<mode>/result.
+
+function createFrameCapture(options) {
+    var mode = options.mode;
+    var video = options.video;
+    var pollMs = options.pollMs || 300;
+    var session = (window.crypto && crypto.randomUUID) ? crypto.randomUUID()
+        : Date.now().toString(16) + Math.random().toString(16).slice(2);
+    var canvas = document.createElement('canvas');
+    var stream = null;
+    var liveTimer = null;
+    var polling = false;
+    var lastFrame = 0;
+
+    function startCamera() {
+        if (stream) {
+            return Promise.resolve();
+        }
+        return navigator.mediaDevices.getUserMedia({ video: true, audio: false }).then(function (s) {
+            stream = s;
+            video.srcObject = s;
+            return video.play();
+        });
+    }
+
+    function stopCamera() {
+        stopLive();
+        if (stream) {
+            stream.getTracks().forEach(function (track) { track.stop(); });
+            stream = null;
+        }
+    }
+
+    function grabFrame() {
+        canvas.width = video.videoWidth;
+        canvas.height = video.videoHeight;
+        canvas.getContext('2d').drawImage(video, 0, 0);
+        return new Promise(function (resolve) {
+            canvas.toBlob(resolve, options.type || 'image/jpeg', options.quality || 0.85);
+        });
+    }
+
+    function sendFrame() {
+        return grabFrame().then(function (blob) {
+            var body = new FormData();
+            body.append('frame', blob, 'frame');
+            return fetch('/api/frames/' + mode + '?session=' + session, { method: 'POST', body: body });
+        }).then(function (response) {
+            return response.json();
+        }).then(function (info) {
+            return info.frame;
+        });
+    }
+
+    function fetchResult() {
+        return fetch('/api/frames/' + mode + '/result?session=' + session + '&after=' + lastFrame)
+            .then(function (response) {
+                if (response.status !== 200) {
+                    return null;
+                }
+                return response.json().then(function (payload) {
+                    lastFrame = payload.frame;
+                    options.onResult(payload);
+                    return payload;
+                });
+            });
+    }
+
+    function waitForResult(frame) {
+        return fetchResult().then(function (payload) {
+            if (payload && payload.frame >= frame) {
+                return payload;
+            }
+            return new Promise(function (resolve) { setTimeout(resolve, pollMs); }).then(function () {
+                return waitForResult(frame);
+            });
+        });
+    }
+
+    // Single snapshot: send one frame and wait for its result. Frames the
+    // server skipped for quality (blur, exposure, glare) are retried a few times.
+    function captureOnce(retries) {
+        retries = retries === undefined ? (options.retries || 3) : retries;
+        return startCamera().then(sendFrame).then(waitForResult).then(function (payload) {
+            if (payload.result && payload.result.skipped && retries > 0) {
+                return new Promise(function (resolve) { setTimeout(resolve, pollMs); }).then(function () {
+                    return captureOnce(retries - 1);
+                });
+            }
+            return payload;
+        });
+    }
+
+    // Live mode: send a frame every intervalMs and keep polling for results
+    function startLive(intervalMs) {
+        return startCamera().then(function () {
+            liveTimer = setInterval(sendFrame, intervalMs || 1000);
+            polling = true;
+            (function poll() {
+                if (!polling) {
+                    return;
+                }
+                fetchResult().then(function () { setTimeout(poll, pollMs); }, function () { setTimeout(poll, pollMs); });
+            })();
+        });
+    }
+
+    function stopLive() {
+        polling = false;
+        if (liveTimer) {
+            clearInterval(liveTimer);
+            liveTimer = null;
+        }
+    }
+
+    return {
+        startCamera: startCamera,
+        stopCamera: stopCamera,
+        captureOnce: captureOnce,
+        startLive: startLive,
+        stopLive: stopLive
+    };
+}
+
+function playResultAudio(audioElement, audioFile) {
+    if (!audioFile) {
+        return;
+    }
+    var src = '/audio/' + audioFile;
+    if (audioElement.getAttribute('src') !== src) {
+        audioElement.setAttribute('src', src);
+        audioElement.play();
+    }
+}
+
+// Plays result audio files one after another (used for newly read lines)
+function createAudioQueue(audioElement) {
+    var queue = [];
+
+    function playNext() {
+        if (queue.length === 0 || !(audioElement.paused || audioElement.ended)) {
+            return;
+        }
+        audioElement.setAttribute('src', '/audio/' + queue.shift());
+        audioElement.play();
+    }
+
+    audioElement.addEventListener('ended', playNext);
+
+    return {
+        push: function (audioFile) {
+            if (audioFile) {
+                queue.push(audioFile);
+                playNext();
+            }
+        }
+    };
+}
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Run from anywhere: the app's packages live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the on-disk caches created at import time out of the working tree
+_cache_dir = tempfile.mkdtemp(prefix='clearify-tests-')
+os.environ.setdefault('CLEARIFY_CAPTION_CACHE', os.path.join(_cache_dir, 'captions.sqlite3'))
+os.environ.setdefault('CLEARIFY_OCR_JOB_CACHE', os.path.join(_cache_dir, 'ocr_cache'))
@@ -0,0 +1,111 @@
+import io
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+import app as clearify
+from services.layout import analyze_layout
+
+
+# What PaddleOCR would return for a page with a confident line and, further down, noise
+OCR_RESULTS = [[
+    [[[0, 0], [200, 0], [200, 20], [0, 20]], ('Exit', 0.99)],
+    [[[0, 80], [200, 80], [200, 100], [0, 100]], ('~~ zq', 0.3)],
+]]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # No models: the upload OCR is replaced by a fixed result
+    def perform_ocr_layout(image_path):
+        return analyze_layout(OCR_RESULTS), image_path, '20240101000000'
+
+    monkeypatch.setattr(clearify.text_recognition_upload, 'perform_ocr_layout', perform_ocr_layout)
+    monkeypatch.setitem(clearify.app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    clearify.app.config['TESTING'] = True
+    return clearify.app.test_client()
+
+
+def post_image(client):
+    return client.post('/api/ocr', data={'image': (io.BytesIO(b'image'), 'page.png')},
+                       content_type='multipart/form-data')
+
+
+def test_api_ocr_returns_layout_and_filtered_text(client):
+    response = post_image(client)
+    assert response.status_code == 200
+    payload = response.get_json()
+    # `text` leaves out low-confidence words; blocks and words keep everything
+    assert payload['text'] == 'Exit'
+    assert [block['text'] for block in payload['blocks']] == ['Exit', '~~ zq']
+    assert [(word['text'], word['doubtful']) for word in payload['words']] == \
+        [('Exit', False), ('~~', True), ('zq', True)]
+    assert payload['layout_id']
+
+
+def test_api_ocr_requires_an_image(client):
+    response = client.post('/api/ocr', data={}, content_type='multipart/form-data')
+    assert response.status_code == 400
+
+
+def test_api_ocr_speak_selected_blocks(client):
+    layout_id = post_image(client).get_json()['layout_id']
+
+    response = client.post(f'/api/ocr/{layout_id}/speak', json={'blocks': [0]})
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload['text'] == 'Exit'
+    assert payload['stream_url'].startswith('/speech/')
+
+    # The second block is only noise: nothing left to speak
+    assert client.post(f'/api/ocr/{layout_id}/speak', json={'blocks': [1]}).status_code == 400
+    assert client.post('/api/ocr/unknown/speak', json={}).status_code == 404
+
+
+@pytest.mark.parametrize('payload', [{'blocks': 0}, {'blocks': ['0']}, {'blocks': [True]}, [0]])
+def test_api_ocr_speak_rejects_malformed_blocks(client, payload):
+    layout_id = post_image(client).get_json()['layout_id']
+    response = client.post(f'/api/ocr/{layout_id}/speak', json=payload)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_api_jobs_refuses_oversized_uploads(client, monkeypatch):
+    monkeypatch.setitem(clearify.app.config, 'MAX_CONTENT_LENGTH', 1024 * 1024)
+    response = client.post('/api/jobs', data={'file': (io.BytesIO(b'%PDF-' + b'\0' * 1024 * 1024), 'big.pdf')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 413
+    assert response.get_json()['error'] == 'Uploads are limited to 1 MB.'
+
+
+def test_object_live_speaks_only_when_the_objects_change(monkeypatch):
+    np = pytest.importorskip('numpy')
+    detections = []
+    spoken = []
+
+    def synthesize_speech(text):
+        spoken.append(text)
+        return f'/tmp/{len(spoken)}.mp3'
+
+    clock = [100.0]
+    monkeypatch.setattr(clearify.object_quality_gate, 'check', lambda frame: (True, None, {}))
+    monkeypatch.setattr(clearify.object_detection_live, 'detect_frame', lambda frame: list(detections))
+    monkeypatch.setattr(clearify, 'synthesize_speech', synthesize_speech)
+    monkeypatch.setattr(clearify.time, 'monotonic', lambda: clock[0])
+    frame, context = np.zeros((8, 8, 3), dtype=np.uint8), {}
+
+    def audio_for(*labels):
+        detections[:] = [(label, 0.9, (0, 0, 1, 1)) for label in labels]
+        return clearify._object_live_frame(frame, context)['audio_file']
+
+    assert audio_for('dog', 'cat', 'dog') == '1.mp3'
+    # Same objects in another order: nothing new to say
+    assert audio_for('cat', 'dog') is None
+    assert audio_for('cat') == '2.mp3'
+    clock[0] += clearify.OBJECT_SPEECH_INTERVAL
+    assert audio_for('cat') == '3.mp3'
+    assert audio_for() is None
+    assert spoken == ['I see cat, dog', 'I see cat', 'I see cat']
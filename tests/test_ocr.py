@@ -0,0 +1,132 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+pytest.importorskip('psutil')
+
+from services.layout import analyze_layout, layout_lines
+from services.ocr_result import OCRResult
+from services.ocr_tiling import merge_boxes, tile_grid
+
+
+def box(x1, y1, x2, y2):
+    return [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+
+
+def ocr_results(*spans):
+    """`ocr.ocr` layout for (x1, y1, x2, y2, text, score) spans."""
+    return [[[box(x1, y1, x2, y2), (text, score)] for x1, y1, x2, y2, text, score in spans]]
+
+
+# Two prose columns 20 text heights wide, 2 heights apart, with aligned lines
+TWO_COLUMNS = ocr_results(
+    (0, 40, 400, 60, 'left one', 0.99),
+    (440, 40, 840, 60, 'right one', 0.98),
+    (0, 0, 840, 20, 'Title', 0.97),
+    (440, 70, 840, 90, 'right two', 0.4),
+    (0, 70, 400, 90, 'left two', 0.9),
+)
+
+
+def test_layout_reads_title_then_columns():
+    result = analyze_layout(TWO_COLUMNS)
+    assert [block.text for block in result.blocks] == ['Title', 'left one left two', 'right one right two']
+    assert [block.column for block in result.blocks] == [0, 0, 1]
+    assert layout_lines(TWO_COLUMNS) == ['Title', 'left one', 'left two', 'right one', 'right two']
+
+
+def test_layout_reads_receipt_rows_across_the_gutter():
+    rows = [('MILK', '2.99'), ('BREAD', '1.50'), ('EGGS', '3.20'), ('TOTAL', '7.69')]
+    receipt = ocr_results(*[span for index, (item, price) in enumerate(rows) for span in (
+        (0, index * 30, 20 + 15 * len(item), index * 30 + 20, item, 0.99),
+        (300, index * 30 + 1, 360, index * 30 + 21, price, 0.99),
+    )])
+    assert layout_lines(receipt) == ['MILK 2.99', 'BREAD 1.50', 'EGGS 3.20', 'TOTAL 7.69']
+
+
+def test_layout_skips_empty_spans():
+    assert analyze_layout(ocr_results((0, 0, 100, 20, '  ', 0.9))).blocks == []
+    assert analyze_layout(None).text == ''
+    assert analyze_layout([None]).text == ''
+
+
+def test_layout_splits_words_along_the_box():
+    words = analyze_layout(ocr_results((0, 0, 110, 20, 'hello world', 0.9))).words()
+    assert [word.text for word in words] == ['hello', 'world']
+    assert words[0].box == [0.0, 0.0, 50.0, 20.0]
+    assert words[1].box == [60.0, 0.0, 110.0, 20.0]
+    assert all(word.confidence == 0.9 for word in words)
+
+
+def test_result_filtering_and_selection():
+    result = analyze_layout(TWO_COLUMNS)
+    assert result.filtered(0.6).text == 'Title\nleft one left two\nright one'
+    assert result.filtered(0.999).blocks == []
+    assert result.select([2]).text == 'right one right two'
+    assert result.select(None) is result
+    assert result.select([]).blocks == []
+
+
+def test_result_to_dict_flags_doubtful_words():
+    payload = analyze_layout(TWO_COLUMNS).to_dict(doubtful_confidence=0.95)
+    # 'left two' scored 0.9 and 'right two' 0.4; the title and first lines are above 0.95
+    assert [word['text'] for word in payload['words'] if word['doubtful']] == ['left', 'two', 'right', 'two']
+    assert payload['text'] == 'Title\nleft one left two\nright one right two'
+    assert [block['id'] for block in payload['blocks']] == [0, 1, 2]
+    assert OCRResult().to_dict() == {'text': '', 'confidence': 0.0, 'blocks': [], 'words': []}
+
+
+def test_tile_grid_covers_the_image():
+    tiles = tile_grid(1000, 2000, 960, 96)
+    covered = set()
+    for x, y, w, h in tiles:
+        assert w <= 960 and h <= 960
+        assert x + w <= 2000 and y + h <= 1000
+        covered.update((column, row) for column in range(x, x + w, 8) for row in range(y, y + h, 8))
+    assert covered == {(column, row) for column in range(0, 2000, 8) for row in range(0, 1000, 8)}
+    assert tile_grid(500, 600, 960, 96) == [(0, 0, 600, 500)]
+
+
+def test_merge_boxes_drops_duplicates_and_joins_seams():
+    whole = box(0, 0, 200, 20)
+    duplicate = box(10, 2, 100, 18)
+    left_half, right_half = box(300, 100, 500, 120), box(480, 101, 700, 121)
+    merged = merge_boxes([duplicate, whole, left_half, right_half])
+    assert len(merged) == 2
+    assert whole in merged
+    assert [[300.0, 100.0], [700.0, 100.0], [700.0, 121.0], [300.0, 121.0]] in merged
+
+
+def test_planner_cascades_only_on_low_confidence():
+    np = pytest.importorskip('numpy')
+    from services.ocr_preprocess import PreprocessPlanner
+
+    checkerboard = (np.indices((240, 320)).sum(axis=0) // 8 % 2 * 150 + 50).astype(np.uint8)
+    page = np.dstack([checkerboard] * 3)
+    planner = PreprocessPlanner(cascade=True, cascade_threshold=0.8)
+    assert planner.plan(page) == ['none', 'brighten']
+    assert planner.plan(page // 5)[0] == 'gamma'
+
+    def ocr_scoring(*scores):
+        calls = []
+
+        def ocr(img):
+            calls.append(img)
+            return ocr_results((0, 0, 100, 20, 'text', scores[len(calls) - 1]))
+        return ocr, calls
+
+    ocr, calls = ocr_scoring(0.5, 0.9)
+    results, processed, variant = planner.run(page, ocr)
+    assert variant == 'brighten' and len(calls) == 2
+    assert results[0][0][1] == ('text', 0.9)
+    assert processed is calls[1]
+
+    # A confident first pass, or cascade off, stops after one OCR run
+    ocr, calls = ocr_scoring(0.9)
+    assert planner.run(page, ocr)[2] == 'none' and len(calls) == 1
+    ocr, calls = ocr_scoring(0.5)
+    assert planner.run(page, ocr, cascade=False)[2] == 'none' and len(calls) == 1
+
+    metrics = planner.metrics()
+    assert metrics['cascades'] == 1
+    assert metrics['variants']['none']['runs'] == 3 and metrics['variants']['none']['chosen'] == 2
@@ -0,0 +1,182 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+import services.ocr_engine as ocr_engine_module
+from services.ocr_engine import OCREngine
+
+
+class FakeOCR:
+    """Stands in for PaddleOCR: a crop reads as the value of its right half."""
+
+    def __init__(self, label='0'):
+        self.label = label
+        self.classified = 0
+        self.recognized = 0
+
+    def text_classifier(self, crops):
+        self.classified += len(crops)
+        return crops, [[self.label, 0.99] for _ in crops], 0.0
+
+    def ocr(self, crops, det=False, cls=False):
+        self.recognized += len(crops)
+        return [[(f'text{crop[-1, -1, 0]}', 0.9) for crop in crops]]
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    fake = FakeOCR()
+    monkeypatch.setattr(ocr_engine_module, 'get_ocr', lambda: fake)
+    return fake
+
+
+def crop(value):
+    # Half dark, half `value`, so the contrast-normalized cache keys differ
+    img = np.zeros((16, 64, 3), dtype=np.uint8)
+    img[:, 32:] = value
+    img[:8, :16] = 255 - value
+    return img
+
+
+def test_recognize_serves_repeated_crops_from_the_cache(fake_ocr):
+    engine = OCREngine()
+    first = engine.recognize([crop(100), crop(100), crop(200)])
+    assert first == [('text100', 0.9), ('text100', 0.9), ('text200', 0.9)]
+    assert fake_ocr.recognized == 2
+
+    assert engine.recognize([crop(200)]) == [('text200', 0.9)]
+    assert fake_ocr.recognized == 2
+    metrics = engine.metrics()
+    assert metrics['cache_hits'] == 1 and metrics['cache_misses'] == 2
+
+
+def test_one_shot_calls_always_run_the_angle_classifier(fake_ocr):
+    engine = OCREngine(stable_after=2, skip_calls=5)
+    for value in range(10, 90, 10):
+        engine.recognize([crop(value)])
+    assert fake_ocr.classified == 8
+    assert engine.metrics()['cls_skipped'] == 0
+
+
+def test_live_session_skips_the_classifier_only_for_itself(fake_ocr):
+    engine = OCREngine(stable_after=2, skip_calls=2)
+    session = engine.orientation_state()
+    values = iter(range(10, 250, 10))
+    for _ in range(4):
+        engine.recognize([crop(next(values))], orientation=session)
+    # Two upright passes, then two skipped ones
+    assert fake_ocr.classified == 2
+    assert engine.metrics()['cls_skipped'] == 2
+
+    # Another session and one-shot callers still classify
+    engine.recognize([crop(next(values))], orientation=engine.orientation_state())
+    engine.recognize([crop(next(values))])
+    assert fake_ocr.classified == 4
+
+
+def test_unclassified_crops_are_not_cached(fake_ocr):
+    engine = OCREngine(stable_after=1, skip_calls=1)
+    session = engine.orientation_state()
+    engine.recognize([crop(10)], orientation=session)
+    engine.recognize([crop(20)], orientation=session)
+    assert fake_ocr.classified == 1
+    assert engine.metrics()['cache_size'] == 1
+
+    # The skipped crop is recognized again, this time with the classifier
+    engine.recognize([crop(20)])
+    assert fake_ocr.classified == 2 and fake_ocr.recognized == 3
+    assert engine.recognize([crop(20)]) == [('text20', 0.9)]
+    assert fake_ocr.recognized == 3
+
+
+SIGNS = {100: 'Exit', 200: 'Push to open', 50: 'Pull'}
+
+
+class FakeEngine:
+    """OCREngine stand-in for the tracker: uniform crops are read by their brightness."""
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.detected = 0
+        self.recognized = 0
+        self.orientations = set()
+
+    def detect(self, frame):
+        self.detected += 1
+        return self.boxes
+
+    def orientation_state(self):
+        return object()
+
+    def recognize(self, crops, orientation=None):
+        self.recognized += len(crops)
+        self.orientations.add(orientation)
+        return [(SIGNS[int(round(crop.mean()))], 0.95) for crop in crops]
+
+
+def page(*lines):
+    """Frame with uniform text lines, given as (y, brightness)."""
+    frame = np.zeros((120, 200, 3), dtype=np.uint8)
+    for y, value in lines:
+        frame[y - 4:y + 24, 6:194] = value
+    return frame
+
+
+def test_tracker_recognizes_only_new_or_changed_regions():
+    from services.text_tracker import TextRegionTracker
+
+    boxes = [[[10, 10], [190, 10], [190, 30], [10, 30]], [[10, 60], [190, 60], [190, 80], [10, 80]]]
+    engine = FakeEngine(boxes)
+    tracker = TextRegionTracker(detect_every=5)
+
+    assert tracker.update(page((10, 100), (60, 200)), engine) == ['Exit', 'Push to open']
+    # Same page: no detection, no recognition, nothing new to speak
+    assert tracker.update(page((10, 100), (60, 200)), engine) == []
+    assert (engine.detected, engine.recognized) == (1, 2)
+
+    # Only the changed line is recognized again
+    assert tracker.update(page((10, 100), (60, 50)), engine) == ['Pull']
+    assert engine.recognized == 3
+
+    # A slightly shifted detection keeps the region, and its text is not spoken twice
+    region_ids = [region.id for region in tracker.regions]
+    engine.boxes = [[[12, 11], [192, 11], [192, 31], [12, 31]], boxes[1]]
+    assert tracker.update(page((10, 100), (60, 50)), engine, redetect=True) == []
+    assert [region.id for region in tracker.regions] == region_ids
+    assert tracker.transcript() == ['Exit', 'Pull']
+    assert len(engine.orientations) == 1 and None not in engine.orientations
+    assert tracker.metrics() == {'regions': 2, 'detections': 2, 'recognitions': 3, 'recognitions_skipped': 5}
+
+
+def test_ocr_batcher_gives_each_image_its_own_result(monkeypatch):
+    import services.ocr_batcher as ocr_batcher_module
+    from services.ocr_batcher import OCRBatcher
+
+    def detect(img):
+        if img[0, 0, 0] == 0:
+            raise ValueError('unreadable')
+        # One box per 10 brightness levels
+        return [[[0, 20 * row], [60, 20 * row], [60, 20 * row + 16], [0, 20 * row + 16]]
+                for row in range(img[0, 0, 0] // 10)]
+
+    calls = []
+
+    def recognize(crops, cls=True):
+        calls.append(len(crops))
+        return [(f'text{crop[0, 0, 0]}', 0.9) for crop in crops]
+
+    monkeypatch.setattr(ocr_batcher_module.ocr_engine, 'detect', detect)
+    monkeypatch.setattr(ocr_batcher_module.ocr_engine, 'recognize', recognize)
+    batcher = OCRBatcher(max_batch_size=4, window_ms=200)
+    images = [np.full((100, 80, 3), value, dtype=np.uint8) for value in (20, 0, 30)]
+    futures = [batcher.submit(img) for img in images]
+
+    first, failed, third = futures
+    assert [line[1] for line in first.result(timeout=5)[0]] == [('text20', 0.9)] * 2
+    assert [line[1] for line in third.result(timeout=5)[0]] == [('text30', 0.9)] * 3
+    with pytest.raises(ValueError):
+        failed.result(timeout=5)
+    batcher.shutdown()
+    # Boxes of both readable images went through one recognition call
+    assert calls == [5]
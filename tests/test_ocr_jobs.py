@@ -0,0 +1,90 @@
+import io
+import time
+import zipfile
+
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+pytest.importorskip('psutil')
+
+import services.ocr_jobs as ocr_jobs_module
+from services.ocr_jobs import OCRJobManager, read_zip_image, zip_image_names
+from services.ocr_result import OCRResult
+
+
+def make_zip(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def png(value):
+    return cv2.imencode('.png', np.full((8, 8, 3), value, dtype=np.uint8))[1].tobytes()
+
+
+def wait_until_done(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.done:
+        assert time.monotonic() < deadline, 'job did not finish'
+        time.sleep(0.01)
+
+
+def test_zip_images_are_read_in_natural_order():
+    data = make_zip({name: b'' for name in
+                     ('scan_10.png', 'scan_2.png', 'notes.txt', 'Scan_1.jpg', '__MACOSX/scan_3.png')})
+    assert zip_image_names(data) == ['Scan_1.jpg', 'scan_2.png', 'scan_10.png']
+
+
+def test_zip_entries_above_the_cap_are_refused():
+    # Highly compressible: small in the archive, 2 MB once decompressed
+    data = make_zip({'big.png': b'\0' * (2 * 1024 * 1024), 'small.png': b'\0' * 100})
+    assert len(data) < 64 * 1024
+    assert read_zip_image(data, 'small.png', 1024 * 1024) == b'\0' * 100
+    with pytest.raises(ValueError, match='big.png'):
+        read_zip_image(data, 'big.png', 1024 * 1024)
+
+
+def test_finished_jobs_are_served_from_the_cache(tmp_path, monkeypatch):
+    calls = []
+
+    def ocr_page(img):
+        calls.append(int(img[0, 0, 0]))
+        return OCRResult()
+
+    monkeypatch.setattr(ocr_jobs_module, 'ocr_page', ocr_page)
+    manager = OCRJobManager(ocr_concurrency=1, cache_dir=str(tmp_path), max_image_mb=1)
+    data = make_zip({'page_2.png': png(20), 'page_10.png': png(100), 'page_1.png': png(10)})
+
+    first = manager.submit('pages.zip', data)
+    wait_until_done(first)
+    assert first.status == 'done' and not first.cached
+    assert sorted(calls) == [10, 20, 100]
+    assert [page['page'] for page in first.ordered_pages()] == [1, 2, 3]
+
+    second = manager.submit('copy.zip', data)
+    assert second.done and second.cached
+    assert second.ordered_pages() == first.ordered_pages()
+    assert len(calls) == 3
+    assert manager.metrics()['cache_hits'] == 1
+
+
+def test_pdf_pages_are_rendered_under_the_pixel_cap(tmp_path):
+    fitz = pytest.importorskip('fitz')
+    from services.pdf_render import render_page
+
+    path = str(tmp_path / 'poster.pdf')
+    with fitz.open() as document:
+        document.new_page(width=2000, height=1000)
+        document.save(path)
+
+    img = cv2.imdecode(np.frombuffer(render_page(path, 0, dpi=72, max_pixels=200_000), dtype=np.uint8),
+                       cv2.IMREAD_COLOR)
+    height, width = img.shape[:2]
+    assert width * height <= 200_000
+    assert abs(width / height - 2) < 0.05
+    # Below the cap the page keeps its dpi
+    img = cv2.imdecode(np.frombuffer(render_page(path, 0, dpi=36), dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert img.shape[:2] == (500, 1000)
@@ -0,0 +1,328 @@
+import os
+import threading
+import time
+
+import pytest
+
+from services.tts_cache import TTSCache
+
+
+def fake_synthesize(calls):
+    def synthesize(text, lang, path):
+        calls.append((text, lang))
+        with open(path, 'wb') as f:
+            f.write(text.encode('utf-8'))
+    return synthesize
+
+
+def test_tts_cache_reuses_normalized_text(tmp_path):
+    calls = []
+    cache = TTSCache(folder=str(tmp_path))
+    first = cache.get_or_create('Hello   world', 'en', 'gtts', fake_synthesize(calls))
+    second = cache.get_or_create(' Hello world ', 'en', 'gtts', fake_synthesize(calls))
+    other_lang = cache.get_or_create('Hello world', 'vi', 'gtts', fake_synthesize(calls))
+
+    assert first == second != other_lang
+    assert calls == [('Hello world', 'en'), ('Hello world', 'vi')]
+    assert cache.metrics()['hits'] == 1
+    assert cache.metrics()['misses'] == 2
+    # Entries on disk are picked up again by a new cache
+    assert TTSCache(folder=str(tmp_path)).metrics()['files'] == 2
+
+
+def test_tts_cache_evicts_least_recently_used(tmp_path):
+    calls = []
+    cache = TTSCache(folder=str(tmp_path), max_files=2)
+    oldest = cache.get_or_create('one', 'en', 'gtts', fake_synthesize(calls))
+    cache.get_or_create('two', 'en', 'gtts', fake_synthesize(calls))
+    cache.get_or_create('one', 'en', 'gtts', fake_synthesize(calls))
+    cache.get_or_create('three', 'en', 'gtts', fake_synthesize(calls))
+
+    metrics = cache.metrics()
+    assert metrics['files'] == 2 and metrics['evictions'] == 1
+    # 'one' was used again, so 'two' is the one evicted
+    assert (tmp_path / os.path.basename(oldest)).exists()
+    assert not (tmp_path / TTSCache.key('two', 'en', 'gtts')).exists()
+
+
+def test_tts_cache_cleans_up_failed_synthesis(tmp_path):
+    cache = TTSCache(folder=str(tmp_path))
+
+    def failing(text, lang, path):
+        open(path, 'wb').close()
+        raise RuntimeError('offline')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_create('hello', 'en', 'gtts', failing)
+    assert list(tmp_path.iterdir()) == []
+
+
+def encoded_frame():
+    np = pytest.importorskip('numpy')
+    cv2 = pytest.importorskip('cv2')
+    return cv2.imencode('.jpg', np.zeros((16, 16, 3), dtype=np.uint8))[1].tobytes()
+
+
+def wait_for_result(ingest, mode, session, after=0, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        payload = ingest.result(mode, session, after)
+        if payload is not None:
+            return payload
+        time.sleep(0.01)
+    raise AssertionError('no result')
+
+
+def test_frame_ingest_keeps_only_the_latest_waiting_frame():
+    frame = encoded_frame()
+    from services.frame_ingest import FrameIngest
+
+    release = threading.Event()
+    seen = []
+
+    def handler(img, context):
+        context['count'] = context.get('count', 0) + 1
+        seen.append(img.shape)
+        release.wait(timeout=5)
+        return {'count': context['count']}
+
+    ingest = FrameIngest(max_workers=1)
+    ingest.register('test', handler)
+    assert ingest.submit('test', 's1', frame) == {'frame': 1, 'status': 'processing'}
+    assert ingest.submit('test', 's1', frame) == {'frame': 2, 'status': 'waiting'}
+    # Frame 3 replaces frame 2 while frame 1 is still being processed
+    assert ingest.submit('test', 's1', frame) == {'frame': 3, 'status': 'waiting'}
+    release.set()
+
+    payload = wait_for_result(ingest, 'test', 's1', after=1)
+    assert payload['frame'] == 3
+    # The per-session context is shared across frames
+    assert payload['result'] == {'count': 2}
+    assert seen == [(16, 16, 3), (16, 16, 3)]
+    assert ingest.result('test', 's1', after=3) is None
+    metrics = ingest.metrics()
+    assert metrics['frames_received'] == 3
+    assert metrics['frames_processed'] == 2
+    assert metrics['frames_dropped'] == 1
+
+
+def test_frame_ingest_reports_undecodable_frames():
+    encoded_frame()
+    from services.frame_ingest import FrameIngest
+
+    ingest = FrameIngest(max_workers=1)
+    ingest.register('test', lambda img, context: {})
+    ingest.submit('test', 's1', b'not an image')
+    payload = wait_for_result(ingest, 'test', 's1')
+    assert payload['frame'] == 1 and 'error' in payload
+    assert ingest.result('other', 's1') is None
+
+
+def test_quality_gate_rejects_bad_frames_and_picks_the_sharpest():
+    np = pytest.importorskip('numpy')
+    cv2 = pytest.importorskip('cv2')
+    from services.frame_quality import QualityGate
+
+    checkerboard = (np.indices((240, 320)).sum(axis=0) // 8 % 2 * 160 + 40).astype(np.uint8)
+    sharp = cv2.cvtColor(checkerboard, cv2.COLOR_GRAY2BGR)
+    soft = cv2.GaussianBlur(sharp, (5, 5), 0)
+    blurry = cv2.GaussianBlur(sharp, (31, 31), 0)
+    dark = np.full((240, 320, 3), 10, dtype=np.uint8)
+    glare = sharp.copy()
+    glare[:120] = 255
+
+    gate = QualityGate(min_sharpness=60.0)
+    assert gate.check(sharp)[:2] == (True, None)
+    assert gate.check(blurry)[1] == 'blurry'
+    assert gate.check(dark)[1] == 'underexposed'
+    assert gate.check(glare)[1] == 'glare'
+
+    frame, reason, _ = gate.best_of([blurry, soft, sharp, dark])
+    assert frame is sharp and reason is None
+    # Nothing acceptable: the sharpest frame comes back with its reason
+    frame, reason, _ = gate.best_of([dark, blurry])
+    assert frame is blurry and reason == 'blurry'
+    assert gate.best_of([]) == (None, 'no-frames', None)
+    metrics = gate.metrics()
+    assert metrics['checked'] == 10
+    assert metrics['rejected_by_reason'] == {'blurry': 3, 'underexposed': 3, 'glare': 1}
+
+
+def test_speech_stream_falls_back_to_wav_before_any_audio_was_sent(tmp_path, monkeypatch):
+    import services.speech_stream as speech_stream
+    from services.tts import get_engine
+
+    def failing_stream(text, lang, engine):
+        raise RuntimeError('offline')
+        yield
+
+    def offline_synthesize(text, lang, engine):
+        assert engine.name == 'pyttsx3'
+        path = tmp_path / 'speech.wav'
+        path.write_bytes(b'RIFF' + text.encode('utf-8'))
+        return str(path)
+
+    monkeypatch.setenv('CLEARIFY_TTS_ENGINE', 'gtts')
+    monkeypatch.setattr(speech_stream, 'stream_speech', failing_stream)
+    monkeypatch.setattr(speech_stream, 'synthesize_speech', offline_synthesize)
+    streamer = speech_stream.SpeechStreamer()
+
+    chunks, mimetype = streamer.stream('Hello there.')
+    assert mimetype == get_engine('pyttsx3').mimetype == 'audio/wav'
+    assert b''.join(chunks) == b'RIFFHello there.'
+
+
+def test_speech_stream_ends_after_mp3_was_sent(tmp_path, monkeypatch):
+    import services.speech_stream as speech_stream
+
+    def partial_stream(text, lang, engine):
+        path = tmp_path / 'first.mp3'
+        path.write_bytes(b'ID3first')
+        yield 'First.', str(path)
+        raise RuntimeError('network dropped')
+
+    monkeypatch.setenv('CLEARIFY_TTS_ENGINE', 'gtts')
+    monkeypatch.setattr(speech_stream, 'stream_speech', partial_stream)
+    streamer = speech_stream.SpeechStreamer()
+
+    chunks, mimetype = streamer.stream('First. Second.')
+    assert mimetype == 'audio/mpeg'
+    assert list(chunks) == [b'ID3first']
+    assert streamer.metrics()['streams'] == 1
+
+
+def caption_cache(tmp_path, monkeypatch, **kwargs):
+    pytest.importorskip('numpy')
+    pytest.importorskip('cv2')
+    import services.caption_cache as caption_cache_module
+    # Images stand in as (key, dHash) pairs
+    monkeypatch.setattr(caption_cache_module, 'image_keys', lambda image: image)
+    return caption_cache_module.CaptionCache(path=str(tmp_path / 'captions.sqlite3'), **kwargs)
+
+
+def test_caption_cache_reuses_captions_across_restarts(tmp_path, monkeypatch):
+    cache = caption_cache(tmp_path, monkeypatch)
+    calls = []
+
+    def generate(image):
+        calls.append(image[0])
+        return f'caption {image[0]}'
+
+    assert cache.get_or_create(('a', 0b1010), generate) == 'caption a'
+    assert cache.get_or_create(('a', 0b1010), generate) == 'caption a'
+    # Off by default: a hash one bit away is still a different image
+    assert cache.get_or_create(('b', 0b1011), generate) == 'caption b'
+    assert calls == ['a', 'b']
+    assert cache.metrics()['exact_hits'] == 1
+
+    reopened = caption_cache(tmp_path, monkeypatch)
+    assert reopened.get_or_create(('b', 0b1011), generate) == 'caption b'
+    assert calls == ['a', 'b']
+    assert reopened.metrics()['entries'] == 2
+
+
+def test_caption_cache_finds_the_closest_near_duplicate(tmp_path, monkeypatch):
+    from services.caption_cache import hash_bands
+
+    assert hash_bands(8) == [(offset, 8) for offset in range(0, 64, 8)]
+    assert sum(width for _, width in hash_bands(11)) == 64
+
+    cache = caption_cache(tmp_path, monkeypatch, max_distance=3)
+    base = 0x0123456789ABCDEF
+    cache.get_or_create(('base', base), lambda image: 'base')
+    # Four bits away: too far to share a caption
+    close = base ^ (1 | 1 << 20 | 1 << 40 | 1 << 60)
+    assert cache.get_or_create(('close', close), lambda image: 'close') == 'close'
+    cache.get_or_create(('other', ~base & (2 ** 64 - 1)), lambda image: 'other')
+
+    # Three bits from `base` but one from `close`
+    near = base ^ (1 | 1 << 20 | 1 << 40)
+    assert cache.get_or_create(('near', near), lambda image: 'generated') == 'close'
+    # Every band differs from every entry: a miss
+    assert cache.get_or_create(('new', base ^ 0x0101010101010101 * 3), lambda image: 'new') == 'new'
+    metrics = cache.metrics()
+    assert metrics['near_duplicate_hits'] == 1 and metrics['misses'] == 4
+
+
+def test_symspell_snapshot_is_rejected_when_stale_or_corrupt(tmp_path):
+    pytest.importorskip('symspellpy')
+    from symspellpy import Verbosity
+    from services.symspell_snapshot import build_sym_spell, read_snapshot, write_snapshot
+
+    source = tmp_path / 'dictionary.txt'
+    source.write_text('hello 100\nworld 80\n')
+    snapshot = str(tmp_path / 'symspell.snapshot')
+    write_snapshot(build_sym_spell(str(source)), str(source), snapshot)
+
+    sym_spell = read_snapshot(str(source), snapshot)
+    assert sym_spell.lookup('helo', Verbosity.CLOSEST, max_edit_distance=2)[0].term == 'hello'
+
+    # A flipped payload byte fails the payload checksum
+    data = bytearray(open(snapshot, 'rb').read())
+    data[-10] ^= 0xFF
+    corrupt = tmp_path / 'corrupt.snapshot'
+    corrupt.write_bytes(bytes(data))
+    assert read_snapshot(str(source), str(corrupt)) is None
+
+    corrupt.write_bytes(b'NOTASNAP' + bytes(data[8:]))
+    assert read_snapshot(str(source), str(corrupt)) is None
+    assert read_snapshot(str(source), str(tmp_path / 'missing.snapshot')) is None
+
+    # An edited dictionary makes the snapshot stale
+    source.write_text('hello 100\nworld 80\nhelp 50\n')
+    assert read_snapshot(str(source), snapshot) is None
+
+
+def test_change_detector_ocrs_only_new_or_sharper_content():
+    np = pytest.importorskip('numpy')
+    cv2 = pytest.importorskip('cv2')
+    from services.frame_change import ChangeDetector
+
+    text = (np.indices((240, 320)).sum(axis=0) // 40 % 2 * 200 + 30).astype(np.uint8)
+    soft = cv2.GaussianBlur(text, (5, 5), 0)
+    other = (260 - text.astype(np.int16)).astype(np.uint8)
+    other[:120] = 230
+
+    detector = ChangeDetector()
+    decisions = []
+    for now, frame in [(10.0, soft), (10.1, soft), (11.0, soft), (12.0, text), (13.0, other), (14.0, other)]:
+        detector.should_ocr(frame, now=now)
+        decisions.append(detector.last_reason)
+    # The camera moving onto a new scene waits one frame for it to settle
+    assert decisions == ['first', 'interval', 'unchanged', 'sharper', 'motion', 'changed']
+    assert (detector.checked, detector.accepted) == (6, 3)
+
+    # The gap between OCR runs follows the measured OCR latency
+    detector.record_ocr_latency(1.0)
+    assert detector.interval() == 1.5
+    assert not detector.should_ocr(text, now=15.0) and detector.last_reason == 'interval'
+
+
+def test_micro_batcher_fans_batch_results_out_to_each_request():
+    from concurrent.futures import Future
+    from services.micro_batcher import MicroBatcher
+
+    class Doubler(MicroBatcher):
+        def __init__(self):
+            super().__init__(max_batch_size=3, window_ms=200)
+            self.batches = []
+
+        def submit(self, value):
+            future = Future()
+            self._enqueue((value, future))
+            return future
+
+        def _process(self, batch):
+            self.batches.append([value for value, _ in batch])
+            for value, future in batch:
+                future.set_result(value * 2)
+
+    batcher = Doubler()
+    futures = [batcher.submit(value) for value in range(5)]
+    assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6, 8]
+    batcher.shutdown()
+    # At most max_batch_size items per batch, in arrival order
+    assert batcher.batches == [[0, 1, 2], [3, 4]]
+    metrics = batcher.metrics()
+    assert metrics['requests'] == 5 and metrics['batches'] == 2
+    assert metrics['batch_size_histogram'] == {2: 1, 3: 1}
@@ -0,0 +1,58 @@
+import os
+import re
+from functools import lru_cache
+
+from symspellpy import Verbosity
+
+from services.model_registry import get_sym_spell
+
+
+# Spell correction shared by every OCR mode. Live OCR sees the same tokens
+# over and over, so corrections are memoized per token.
+TOKEN_CACHE_SIZE = int(os.environ.get('CLEARIFY_SPELL_CACHE_SIZE', 50000))
+
+_NUMBER = re.compile(r'^[\d.,:/-]*\d[\d.,:/-]*$')
+
+
+def clean_text(text):
+    # Loại bỏ các ký tự đặc biệt không mong muốn
+    text = re.sub(r'[^\w\s.,?!-]', '', text)
+    return ' '.join(text.split())
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def correct_token(word):
+    # Numbers are never spell-corrected
+    if _NUMBER.match(word):
+        return word
+    sym_spell = get_sym_spell()
+    # Fast path: the word is already a dictionary term
+    if word in sym_spell.words:
+        return word
+    suggestions = sym_spell.lookup(word, Verbosity.CLOSEST, max_edit_distance=2)
+    if suggestions:
+        return suggestions[0].term  # Lấy gợi ý tốt nhất
+    return word
+
+
+def postprocess_text(text):
+    return ' '.join(correct_token(word) for word in clean_text(text).split())
+
+
+def postprocess_lines(lines):
+    """Corrects many lines at once, looking up each distinct token only once."""
+    tokenized = [clean_text(line).split() for line in lines]
+    corrections = {word: correct_token(word) for words in tokenized for word in set(words)}
+    return [' '.join(corrections[word] for word in words) for words in tokenized]
+
+
+def cache_metrics():
+    info = correct_token.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': round(info.hits / lookups, 3) if lookups else 0.0,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+    }
@@ -1,111 +1,238 @@
+import atexit
 import cv2
 import numpy as np
 import time
 import threading
-import queue
-from paddleocr import PaddleOCR
-from symspellpy import SymSpell, Verbosity
-import pkg_resources
-import re
+from collections import deque
 import pyttsx3
+from services.camera import camera_service
+from services.frame_change import ChangeDetector
+from services.frame_quality import text_quality_gate
+from services.layout import analyze_layout
+from services.ocr_engine import ocr_engine
+from services.text_tracker import TextRegionTracker
+from text_models.text_correction import postprocess_text, postprocess_lines
 
-# Khởi tạo PaddleOCR (chạy một lần khi khởi động)
-ocr = PaddleOCR(use_angle_cls=True, lang='en')
-
-sym_spell = SymSpell(max_dictionary_edit_distance=2, prefix_length=7)
-dictionary_path = pkg_resources.resource_filename(
-    "symspellpy", "frequency_dictionary_en_82_765.txt")
-sym_spell.load_dictionary(dictionary_path, term_index=0, count_index=1)
-
-def postprocess_text(text):
-    # Loại bỏ các ký tự đặc biệt không mong muốn
-    text = re.sub(r'[^\w\s.,?!-]', '', text)
-    text = ' '.join(text.split())
-    words = text.split()
-    corrected_words = []
-    for word in words:
-        suggestions = sym_spell.lookup(word, Verbosity.CLOSEST, max_edit_distance=2)
-        if suggestions:
-            corrected_words.append(suggestions[0].term) # Lấy gợi ý tốt nhất
-        else:
-            corrected_words.append(word)
-    corrected_text = ' '.join(corrected_words)
-    return corrected_text
+def ocr_raw_text(frame):
+    """Chỉ chạy PaddleOCR, trả về văn bản thô (chưa hiệu chỉnh chính tả)."""
+    results = ocr_engine.ocr(frame)
+    return analyze_layout(results).filtered().text.strip()
 
+
+def ocr_frame_text(frame):
+    """OCR một frame và trả về văn bản đã hiệu chỉnh (chuỗi rỗng nếu không có chữ)."""
+    raw_text = ocr_raw_text(frame)
+    return postprocess_text(raw_text) if raw_text else ""
+
+
+def crop_roi(frame):
+    # Vùng quan tâm (ROI): 80% chiều rộng, 40% chiều cao, ở giữa khung hình
+    height, width = frame.shape[:2]
+    roi_width = int(width * 0.8)
+    roi_height = int(height * 0.4)
+    roi_x = (width - roi_width) // 2
+    roi_y = (height - roi_height) // 2
+    return frame[roi_y:roi_y + roi_height, roi_x:roi_x + roi_width]
+
+
+def track_text(tracker, frame, redetect=False):
+    """Cập nhật tracker với một frame; trả về (toàn bộ văn bản, các dòng mới xuất hiện)."""
+    new_lines = tracker.update(frame, ocr_engine, redetect=redetect)
+    text = ' '.join(line for line in postprocess_lines(tracker.transcript()) if line)
+    new_text = ' '.join(line for line in postprocess_lines(new_lines) if line)
+    return text, new_text
+
+
+def recognize_live_frame(frame, change_detector=None, tracker=None):
+    """OCR vùng ROI của một frame gửi từ trình duyệt; trả về (văn bản, văn bản mới).
+
+    Nếu có `change_detector` và nội dung không đổi thì trả về None (bỏ qua OCR).
+    Có `tracker` thì chỉ nhận dạng lại các vùng chữ mới hoặc đã thay đổi.
+    """
+    roi = crop_roi(frame)
+    if change_detector is not None and not change_detector.should_ocr(roi):
+        return None
+    start = time.perf_counter()
+    if tracker is None:
+        text = ocr_frame_text(roi)
+        new_text = text
+    else:
+        # Khung hình chỉ nét hơn thì giữ các box cũ, không cần chạy lại detector
+        redetect = change_detector is None or change_detector.last_reason != 'sharper'
+        text, new_text = track_text(tracker, roi, redetect=redetect)
+    if change_detector is not None:
+        change_detector.record_ocr_latency(time.perf_counter() - start)
+    return text, new_text
+
+
+# Một worker OCR dùng chung cho mọi phiên live: hàng đợi chỉ có một chỗ,
+# frame mới thay frame đang chờ, và thread ngủ trên condition variable
+# thay vì vòng lặp sleep, nên không tốn CPU khi rảnh. Các vùng chữ được
+# theo dõi qua các frame để chỉ nhận dạng lại vùng mới/đổi và chỉ đọc dòng mới.
 class OCRProcessor:
-    def __init__(self):
-        self.ocr_queue = []
+    STAGES = ('queue_wait', 'ocr', 'postprocess')
+
+    def __init__(self, window=100):
         self.result_text = ""
         self.processing = False
-        self.thread = threading.Thread(target=self._process_queue, daemon=True)
-        self.thread.start()
-    
-    def add_frame(self, frame):
-        if not self.processing:
-            self.ocr_queue.append(frame)
-    
+        self.tracker = TextRegionTracker()
+        self._new_text = []
+        self._pending = None  # (frame, redetect, thời điểm đưa vào)
+        # Tăng mỗi lần reset: kết quả của frame thuộc phiên cũ bị bỏ đi
+        self._generation = 0
+        self._stopped = False
+        self._thread = None
+        self._condition = threading.Condition()
+
+        self._submitted = 0
+        self._replaced = 0
+        self._processed = 0
+        self._latencies = {stage: deque(maxlen=window) for stage in self.STAGES}
+
+    def add_frame(self, frame, redetect=True):
+        with self._condition:
+            if self._stopped:
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._process_queue, name='live-ocr', daemon=True)
+                self._thread.start()
+            if self._pending is not None:
+                self._replaced += 1
+            self._submitted += 1
+            self._pending = (frame, redetect, time.perf_counter())
+            self._condition.notify()
+
     def _process_queue(self):
         while True:
-            if len(self.ocr_queue) != 0:
+            with self._condition:
+                while self._pending is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                (frame, redetect, submitted_at), self._pending = self._pending, None
+                generation, tracker = self._generation, self.tracker
                 self.processing = True
-                frame = self.ocr_queue.pop()
-                try:
-                    results = ocr.ocr(frame, cls=True)
-                    current_frame_text = ""
-                    for line in results:
-                        for word_info in line:
-                            if isinstance(word_info, (list, tuple)) and len(word_info) > 1:
-                                text, confidence = word_info[1]
-                                current_frame_text += text + " "
-                    
-                    if current_frame_text.strip():
-                        self.result_text = postprocess_text(current_frame_text.strip())
+
+            started = time.perf_counter()
+            try:
+                new_lines = tracker.update(frame, ocr_engine, redetect=redetect)
+                recognized = time.perf_counter()
+                text = ' '.join(line for line in postprocess_lines(tracker.transcript()) if line)
+                new_text = ' '.join(line for line in postprocess_lines(new_lines) if line)
+                finished = time.perf_counter()
+                with self._condition:
+                    # reset() chạy trong lúc OCR: frame thuộc phiên trước, không công bố kết quả
+                    if generation != self._generation:
+                        continue
+                    if text:
+                        self.result_text = text
                         print(f"Nhận diện: {self.result_text}")
-                except Exception as e:
-                    print(f"Lỗi PaddleOCR: {e}")
-                self.processing = False
-            time.sleep(0.01)
-    
+                    if new_text:
+                        self._new_text.append(new_text)
+                self._record(started - submitted_at, recognized - started, finished - recognized)
+            except Exception as e:
+                print(f"Lỗi PaddleOCR: {e}")
+            finally:
+                with self._condition:
+                    self.processing = False
+
+    def _record(self, queue_wait, ocr_seconds, postprocess_seconds):
+        with self._condition:
+            self._processed += 1
+            self._latencies['queue_wait'].append(queue_wait)
+            self._latencies['ocr'].append(ocr_seconds)
+            self._latencies['postprocess'].append(postprocess_seconds)
+
     def get_text(self):
         return self.result_text
 
+    def pop_new_text(self):
+        """Lấy (và xoá) các dòng mới chưa được đọc."""
+        with self._condition:
+            new_text, self._new_text = ' '.join(self._new_text), []
+            return new_text
+
+    def mean_ocr_seconds(self):
+        with self._condition:
+            samples = self._latencies['ocr']
+            return sum(samples) / len(samples) if samples else 0.0
+
+    def reset(self):
+        # Bắt đầu phiên mới: bỏ frame đang chờ và văn bản cũ. Worker có thể đang
+        # cập nhật tracker cũ ngoài khoá, nên thay tracker mới thay vì xoá tracker cũ
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+            self._new_text = []
+            self.result_text = ""
+            self.tracker = TextRegionTracker()
+
+    def shutdown(self, timeout=5.0):
+        with self._condition:
+            self._stopped = True
+            self._pending = None
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+
+    def metrics(self):
+        with self._condition:
+            return {
+                'frames_submitted': self._submitted,
+                'frames_replaced': self._replaced,
+                'frames_processed': self._processed,
+                'pending': self._pending is not None,
+                'processing': self.processing,
+                'tracker': self.tracker.metrics(),
+                'mean_latency_ms': {
+                    stage: round(sum(samples) / len(samples) * 1000, 1) if samples else 0.0
+                    for stage, samples in self._latencies.items()
+                },
+            }
+
+
+ocr_processor = OCRProcessor()
+atexit.register(ocr_processor.shutdown)
+
+# Bộ đọc văn bản dùng chung cho mọi phiên live (giống OCRProcessor): chỉ một
+# thread và một engine pyttsx3, chỉ giữ văn bản mới nhất, thread ngủ trên
+# condition variable khi không có gì để đọc.
 class TextToSpeechEngine:
     def __init__(self, min_interval=5, max_speech_duration=5):
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)
+        self.engine = None
         self.speaking = False
-        self.text_queue = []  # Hàng đợi chỉ lưu văn bản mới nhất
         self.last_text = ""
         self.last_speech_time = 0
         self.min_speech_interval = min_interval
-        self.max_speech_duration = max_speech_duration  # Giới hạn thời gian đọc tối đa (15s)
-        
-        # Khởi tạo luồng đọc riêng biệt
-        self.speech_thread = threading.Thread(target=self._process_speech_queue, daemon=True)
-        self.speech_thread.start()
+        self.max_speech_duration = max_speech_duration  # Giới hạn thời gian đọc tối đa
+        self._pending = None  # Chỉ lưu văn bản mới nhất
+        self._stopped = False
+        self._thread = None
+        self._condition = threading.Condition()
 
     def _process_speech_queue(self):
         while True:
-            if self.text_queue and not self.speaking:
-                text = self.text_queue[0]  # Lấy văn bản mới nhất (luôn là phần tử đầu tiên)
-                self.text_queue = []  # Xóa hàng đợi sau khi lấy văn bản
+            with self._condition:
+                while self._pending is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                text, self._pending = self._pending, None
                 self.speaking = True
-                
-                # Tạo thread riêng để đọc văn bản
-                speech_thread = threading.Thread(target=self._speak_with_timeout, args=(text,))
-                speech_thread.start()
-                
-                # Chờ thread đọc hoàn thành hoặc hết thời gian
-                speech_thread.join(timeout=self.max_speech_duration)
-                
-                # Nếu vẫn đang đọc, dừng engine
-                if self.engine.isBusy():
-                    self.engine.stop()
-                
+
+            # Tạo thread riêng để đọc văn bản, chờ hoàn thành hoặc hết thời gian
+            speech_thread = threading.Thread(target=self._speak_with_timeout, args=(text,), daemon=True)
+            speech_thread.start()
+            speech_thread.join(timeout=self.max_speech_duration)
+
+            # Nếu vẫn đang đọc, dừng engine
+            if self.engine.isBusy():
+                self.engine.stop()
+
+            with self._condition:
                 self.speaking = False
                 self.last_speech_time = time.time()
-            
-            time.sleep(0.1)
 
     def _speak_with_timeout(self, text):
         try:
@@ -114,28 +241,62 @@ class TextToSpeechEngine:
         except Exception as e:
             print(f"Lỗi khi đọc văn bản: {e}")
 
+    def can_speak(self):
+        with self._condition:
+            return not self.speaking and self._pending is None and \
+                (time.time() - self.last_speech_time) >= self.min_speech_interval
+
     def say(self, text):
-        current_time = time.time()
-        
-        # Chỉ thêm văn bản mới nếu khác văn bản trước đó và đã qua min_interval
-        if text != self.last_text and (current_time - self.last_speech_time) >= self.min_speech_interval:
-            # Xóa hàng đợi cũ và chỉ giữ văn bản mới nhất
-            self.text_queue = [text]
+        with self._condition:
+            if self._stopped:
+                return
+            # Chỉ thêm văn bản mới nếu khác văn bản trước đó và đã qua min_interval
+            if text == self.last_text or (time.time() - self.last_speech_time) < self.min_speech_interval:
+                return
+            if self._thread is None:
+                self.engine = pyttsx3.init()
+                self.engine.setProperty('rate', 150)
+                self._thread = threading.Thread(target=self._process_speech_queue, name='live-speech', daemon=True)
+                self._thread.start()
+            self._pending = text
             self.last_text = text
+            self._condition.notify()
+
+    def reset(self):
+        # Phiên mới: bỏ văn bản đang chờ, cho phép đọc lại văn bản cũ
+        with self._condition:
+            self._pending = None
+            self.last_text = ""
+
+    def shutdown(self, timeout=5.0):
+        with self._condition:
+            self._stopped = True
+            self._pending = None
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+
+
+speech_engine = TextToSpeechEngine(min_interval=5, max_speech_duration=5)
+atexit.register(speech_engine.shutdown)
 
 def perform_live_text():
-    # Khởi tạo bộ xử lý OCR và bộ đọc văn bản
-    ocr_processor = OCRProcessor()
-    speech_engine = TextToSpeechEngine(min_interval=5, max_speech_duration=5)  
+    # Dùng chung worker OCR và bộ đọc văn bản, chỉ bắt đầu phiên mới
+    ocr_processor.reset()
+    speech_engine.reset()
 
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
+    try:
+        camera_service.acquire()
+    except RuntimeError:
         print("Không thể mở camera")
         return
 
-    ret, first_frame = cap.read()
-    if not ret:
+    try:
+        frame_id, first_frame = camera_service.read()
+    except RuntimeError:
         print("Không thể đọc khung hình đầu tiên")
+        camera_service.release()
         return
     
     height, width = first_frame.shape[:2]
@@ -144,44 +305,59 @@ def perform_live_text():
     roi_x = (width - roi_width) // 2
     roi_y = (height - roi_height) // 2
 
-    frame_counter = 0
-    ocr_interval = 30  
+    # Thay cho chu kỳ cố định 30 frame: chỉ OCR khi nội dung đổi hoặc nét hơn
+    change_detector = ChangeDetector()
 
     print("Bắt đầu nhận diện văn bản trực tiếp. Nhấn 'q' để thoát.")
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            print("Không thể đọc khung hình")
-            break
+    try:
+        while True:
+            try:
+                frame_id, frame = camera_service.read(frame_id)
+            except RuntimeError:
+                print("Không thể đọc khung hình")
+                break
 
-        # Trích xuất vùng quan tâm (ROI)
-        roi = frame[roi_y:roi_y + roi_height, roi_x:roi_x + roi_width].copy()
-        
-        # Vẽ khung ROI
-        cv2.rectangle(frame, (roi_x, roi_y), (roi_x + roi_width, roi_y + roi_height), (0, 255, 0), 2)
+            # Trích xuất vùng quan tâm (ROI)
+            roi = frame[roi_y:roi_y + roi_height, roi_x:roi_x + roi_width].copy()
+
+            # Frame từ camera chỉ đọc được, vẽ lên bản sao
+            frame = frame.copy()
+
+            # Vẽ khung ROI
+            cv2.rectangle(frame, (roi_x, roi_y), (roi_x + roi_width, roi_y + roi_height), (0, 255, 0), 2)
         
-        # Chỉ thêm frame vào hàng đợi OCR theo định kỳ
-        frame_counter += 1
-        if frame_counter >= ocr_interval:
-            ocr_processor.add_frame(roi)
-            frame_counter = 0
+            # Chỉ thêm frame vào hàng đợi OCR khi nội dung thay đổi,
+            # khoảng cách giữa hai lần OCR theo độ trễ OCR thực tế
+            # Bỏ qua frame mờ, thiếu sáng hoặc bị lóa trước khi OCR
+            change_detector.ocr_latency = ocr_processor.mean_ocr_seconds()
+            accepted, skip_reason, _ = text_quality_gate.check(roi)
+            if accepted and change_detector.should_ocr(roi):
+                ocr_processor.add_frame(roi, redetect=change_detector.last_reason != 'sharper')
         
-        # Lấy văn bản đã nhận diện và đọc
-        recognized_text = ocr_processor.get_text()
-        speech_engine.say(recognized_text)
+            # Lấy văn bản đã nhận diện, chỉ đọc những dòng mới xuất hiện
+            recognized_text = ocr_processor.get_text()
+            if speech_engine.can_speak():
+                new_text = ocr_processor.pop_new_text()
+                if new_text:
+                    speech_engine.say(new_text)
         
-        # Hiển thị văn bản trên màn hình
-        cv2.putText(frame, recognized_text[:50], (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            # Hiển thị văn bản trên màn hình
+            cv2.putText(frame, recognized_text[:50], (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
         
-        # Hiển thị trạng thái
-        status = "On processing OCR" if ocr_processor.processing else "Ready"
-        cv2.putText(frame, status, (10, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            # Hiển thị trạng thái
+            if ocr_processor.processing:
+                status = "On processing OCR"
+            elif skip_reason:
+                status = f"Skipped: {skip_reason}"
+            else:
+                status = "Ready"
+            cv2.putText(frame, status, (10, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
-        cv2.imshow('Nhan dien van ban truc tiep', frame)
-
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+            cv2.imshow('Nhan dien van ban truc tiep', frame)
 
-    cap.release()
-    cv2.destroyAllWindows()
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        camera_service.release()
+        cv2.destroyAllWindows()